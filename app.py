@@ -1,8 +1,11 @@
 import os
 import sys
+import json
 import random
+import hashlib
 import base64
 import time
+import threading
 import socket
 import subprocess
 from io import BytesIO
@@ -10,7 +13,8 @@ from pathlib import Path
 import secrets
 from flask import (
     Flask, render_template, request, jsonify, send_from_directory,
-    session, redirect, url_for, send_file, render_template_string, make_response
+    session, redirect, url_for, send_file, render_template_string, make_response,
+    Response, stream_with_context
 )
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
@@ -56,9 +60,12 @@ else:
 AUDIO_INPUT   = os.path.join(exe_dir, 'slitoex', 'audio_input')
 STEMS_OUTPUT  = os.path.join(exe_dir, 'slitoex', 'stems')
 
-for d in (IMAGE_FOLDER, OUTPUT_FOLDER, MEGA_FOLDER, AUDIO_INPUT, STEMS_OUTPUT):
+for d in (IMAGE_FOLDER, OUTPUT_FOLDER, MEGA_FOLDER, AUDIO_INPUT, STEMS_OUTPUT, os.path.join(STEMS_OUTPUT, 'cache')):
     os.makedirs(d, exist_ok=True)
 
+# numba's on-disk cache for librosa's jitted kernels (must be set before librosa is imported)
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(exe_dir, 'slitoex', 'numba_cache'))
+
 DROPBOX_APP_KEY = 'k9qtvznx5g7g0yr'
 DROPBOX_TOKEN   = os.environ.get('DROPBOX_TOKEN', '')
 
@@ -318,39 +325,248 @@ def _draw_slide(img_path, caption, out_path):
     img.save(out_path, format='WEBP', quality=WEBP_QUALITY, method=4)
 
 # ─── Demucs helpers ────────────────────────────────
-
-def run_demucs(input_path: str, mode: str = '2stem') -> Path:
-    """Run Demucs on input_path. Returns directory that contains stems."""
-    input_path = Path(input_path)
-    out_root = Path(STEMS_OUTPUT)
-    out_root.mkdir(parents=True, exist_ok=True)
-
-    cmd = [sys.executable, '-m', 'demucs', '-o', str(out_root)]
-    if mode == '2stem':
-        cmd += ['--two-stems', 'vocals']
-    elif mode == '4stem':
-        pass
-    else:
-        mode = '2stem'
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager, ExitStack
+
+DEMUCS_MODEL   = os.environ.get('SLITOEX_DEMUCS_MODEL', 'htdemucs')
+DEMUCS_WORKERS = int(os.environ.get('SLITOEX_DEMUCS_WORKERS', '2'))
+DEMUCS_TIMEOUT = float(os.environ.get('SLITOEX_DEMUCS_TIMEOUT', '1800'))
+# Total CPU threads for separation, split evenly across the workers so two
+# concurrent songs don't oversubscribe the box (OMP_NUM_THREADS=1 is forced above).
+DEMUCS_THREADS = int(os.environ.get('SLITOEX_DEMUCS_THREADS', str(os.cpu_count() or 1)))
+# Chunked mode (long sets/podcasts): window length and crossfade overlap, seconds.
+DEMUCS_CHUNK_S   = float(os.environ.get('SLITOEX_DEMUCS_CHUNK_S', '60'))
+DEMUCS_OVERLAP_S = float(os.environ.get('SLITOEX_DEMUCS_OVERLAP_S', '5'))
+
+def _demucs_threads_per_worker():
+    return max(1, DEMUCS_THREADS // max(1, DEMUCS_WORKERS))
+
+def _demucs_mode(mode):
+    return mode if mode in ('2stem', '4stem') else '2stem'
+
+def _run_demucs_cli(input_path: str, mode: str, out_dir: Path) -> dict:
+    """Fallback: one `python -m demucs` process per split (reloads the model every time)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # -o <job dir> with a flat filename template → <job dir>/<model>/<stem>.wav, nothing else in there
+    cmd = [sys.executable, '-m', 'demucs', '-n', DEMUCS_MODEL, '-o', str(out_dir),
+           '--filename', '{stem}.{ext}']
+    if _demucs_mode(mode) == '2stem':
         cmd += ['--two-stems', 'vocals']
     cmd.append(str(input_path))
 
     print('[DEMUCS] Running:', ' '.join(cmd))
     env = os.environ.copy()
-    env.setdefault('OMP_NUM_THREADS', '1')
+    env['OMP_NUM_THREADS'] = str(_demucs_threads_per_worker())
     subprocess.run(cmd, check=True, env=env)
 
-    # Demucs writes: STEMS_OUTPUT/<model>/<track_name>/
-    candidates = list(out_root.glob('*/*'))
-    matching = [d for d in candidates if d.is_dir() and input_path.stem.lower() in d.name.lower()]
-    dirs = matching or candidates
-    if not dirs:
-        raise RuntimeError('Demucs output directory not found')
-    newest = max(dirs, key=lambda p: p.stat().st_mtime)
-    return newest
+    model_dir = out_dir / DEMUCS_MODEL
+    stems = {}
+    for f in list(model_dir.glob('*.wav')):
+        os.replace(f, out_dir / f.name)
+        stems[f.stem] = f.name
+    shutil.rmtree(model_dir, ignore_errors=True)
+    if not stems:
+        raise RuntimeError('Demucs produced no stems')
+    return stems
+
+# Separation workers: each process loads the model once, then serves jobs until shutdown.
+_demucs_model = None
+_demucs_executor = None
+_demucs_lock = threading.Lock()
+
+def _demucs_init(model_name, threads=1):
+    global _demucs_model
+    try:
+        import torch
+        torch.set_num_threads(max(1, int(threads)))
+        from demucs.pretrained import get_model
+        m = get_model(model_name)
+        m.cpu()
+        m.eval()
+        _demucs_model = m
+        print(f"[DEMUCS] worker {os.getpid()} loaded {model_name} ({threads} threads)")
+    except Exception as e:
+        print("[DEMUCS] model preload failed, worker will use the CLI:", e)
+        _demucs_model = None
+
+def _pcm_blocks(path, sr, channels, block):
+    """
+    Decode path sequentially as (channels, <=block) float32 arrays at sr.
+    ffmpeg pipe; soundfile blocks (+ per-block resample) as fallback.
+    """
+    if shutil.which("ffmpeg"):
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", str(path),
+               "-ac", str(channels), "-ar", str(sr), "-f", "f32le", "-"]
+        with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as p:
+            try:
+                while True:
+                    x = _read_pcm_f32(p.stdout, block * channels)
+                    if x.size < channels:
+                        break
+                    yield x[:x.size - x.size % channels].reshape(-1, channels).T
+            finally:
+                p.stdout.close()
+                p.kill()
+        return
+    with sf.SoundFile(str(path)) as fh:
+        for x in fh.blocks(blocksize=max(1, int(block * fh.samplerate / sr)), dtype='float32', always_2d=True):
+            x = x.T
+            if x.shape[0] != channels:
+                x = np.repeat(x.mean(0, keepdims=True), channels, axis=0)
+            if fh.samplerate != sr:
+                x = librosa.resample(x, orig_sr=fh.samplerate, target_sr=sr)
+            yield x.astype(np.float32)
+
+def _rechunk(blocks, size, overlap):
+    """Re-slice a block stream into windows of size+overlap that advance by size."""
+    buf = None
+    for b in blocks:
+        buf = b if buf is None else np.concatenate([buf, b], axis=1)
+        while buf.shape[1] >= size + overlap:
+            yield buf[:, :size + overlap], False
+            buf = buf[:, size:]
+    if buf is not None and buf.shape[1]:
+        yield buf, True
+
+def _demucs_job_chunked(input_path, mode, out_dir, chunk_s, overlap_s):
+    """
+    Memory-bounded separation: overlapping windows through the model, linear
+    crossfade over the overlap, stems appended to disk as they are finished.
+    Peak memory scales with chunk_s, not with track length.
+    """
+    import torch
+    from demucs.apply import apply_model
+
+    m = _demucs_model
+    sr, ch = m.samplerate, m.audio_channels
+    size, ov = int(chunk_s * sr), int(overlap_s * sr)
+    block = max(size, sr)
+
+    # Pass 1: track-wide normalisation stats, same as the whole-file path
+    n = s1 = s2 = 0.0
+    for x in _pcm_blocks(input_path, sr, ch, block):
+        ref = x.mean(0).astype(np.float64)
+        n += ref.size; s1 += ref.sum(); s2 += np.dot(ref, ref)
+    if n == 0:
+        raise RuntimeError('could not decode input')
+    mu = s1 / n
+    sd = float(np.sqrt(max(s2 / n - mu * mu, 0.0))) + 1e-8
+
+    names = ['vocals', 'no_vocals'] if _demucs_mode(mode) == '2stem' else list(m.sources)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    writers = {k: sf.SoundFile(str(out_dir / f'{k}.wav'), 'w', samplerate=sr, channels=ch, subtype='PCM_16')
+               for k in names}
+    fade = np.linspace(0.0, 1.0, ov, dtype=np.float32) if ov else None
+
+    def write(stems, a, b):
+        for k, y in stems.items():
+            writers[k].write(np.clip(y[:, a:b], -1.0, 1.0).T)
+
+    try:
+        tail = None
+        for x, last in _rechunk(_pcm_blocks(input_path, sr, ch, block), size, ov):
+            with torch.no_grad():
+                src = apply_model(m, torch.from_numpy((x - mu) / sd)[None], device='cpu',
+                                  split=True, overlap=0.25, progress=False)[0]
+            src = (src * sd + mu).numpy()
+            stems = dict(zip(m.sources, src))
+            if _demucs_mode(mode) == '2stem':
+                voc = stems.pop('vocals')
+                stems = {'vocals': voc, 'no_vocals': sum(stems.values())}
+            L = x.shape[1]
+            if tail is not None:
+                k = min(ov, L)
+                for name, y in stems.items():
+                    y[:, :k] = tail[name][:, :k] * (1.0 - fade[:k]) + y[:, :k] * fade[:k]
+            if last or L <= ov:
+                write(stems, 0, L)
+                tail = None
+                break
+            write(stems, 0, L - ov)
+            tail = {name: y[:, L - ov:].copy() for name, y in stems.items()}
+        if tail is not None:
+            write(tail, 0, ov)
+    finally:
+        for w in writers.values():
+            w.close()
+    return {k: f'{k}.wav' for k in names}
+
+def _demucs_job(input_path, mode, out_dir, chunk_s=None):
+    if _demucs_model is None:
+        return _run_demucs_cli(input_path, mode, out_dir)
+    if chunk_s:
+        return _demucs_job_chunked(input_path, mode, out_dir, chunk_s, min(DEMUCS_OVERLAP_S, chunk_s / 2))
+    import torch
+    from demucs.apply import apply_model
+    from demucs.audio import AudioFile, save_audio
+
+    m = _demucs_model
+    wav = AudioFile(input_path).read(streams=0, samplerate=m.samplerate, channels=m.audio_channels)
+    ref = wav.mean(0)
+    mu, sd = ref.mean(), ref.std() + 1e-8
+    with torch.no_grad():
+        sources = apply_model(m, ((wav - mu) / sd)[None], device='cpu', split=True,
+                              overlap=0.25, progress=False)[0]
+    sources = sources * sd + mu
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stems = dict(zip(m.sources, sources))
+    if _demucs_mode(mode) == '2stem':
+        voc = stems.pop('vocals')
+        stems = {'vocals': voc, 'no_vocals': sum(stems.values())}
+    for name, src in stems.items():
+        save_audio(src, str(out_dir / f'{name}.wav'), samplerate=m.samplerate)
+    return {name: f'{name}.wav' for name in stems}
+
+def _demucs_pool():
+    global _demucs_executor
+    with _demucs_lock:
+        if _demucs_executor is None:
+            _demucs_executor = ProcessPoolExecutor(max_workers=max(1, DEMUCS_WORKERS),
+                                                   mp_context=_pool_context(),
+                                                   initializer=_demucs_init,
+                                                   initargs=(DEMUCS_MODEL, _demucs_threads_per_worker()))
+        return _demucs_executor
+
+def _demucs_reset(pool):
+    """Drop `pool` if it is still the current one (a concurrent caller may have replaced it)."""
+    global _demucs_executor
+    with _demucs_lock:
+        if _demucs_executor is pool:
+            _demucs_executor = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def run_demucs(input_path: str, mode: str = '2stem', out_dir=None, chunk_s=None):
+    """
+    Separate input_path on a resident Demucs worker into out_dir (default: a
+    fresh STEMS_OUTPUT/jobs/<id>/). Returns (out_dir, {stem name: file name}).
+    chunk_s: separate in overlapping windows of that many seconds (bounded memory).
+    """
+    out_dir = Path(out_dir) if out_dir else Path(STEMS_OUTPUT) / 'jobs' / uuid.uuid4().hex
+    out_dir.mkdir(parents=True, exist_ok=True)
+    pool = _demucs_pool()
+    try:
+        fut = pool.submit(_demucs_job, str(input_path), _demucs_mode(mode), str(out_dir), chunk_s)
+        return out_dir, fut.result(timeout=DEMUCS_TIMEOUT)
+    except BrokenProcessPool as e:
+        print("[DEMUCS] worker pool died, falling back to CLI:", e)
+        _demucs_reset(pool)
+        return out_dir, _run_demucs_cli(input_path, mode, out_dir)
+
+def _stem_files(stem_dir: Path) -> list:
+    """Stem files of a cache entry, from its manifest (falls back to listing the dir)."""
+    man = _read_manifest(Path(stem_dir))
+    if man and man.get('stems'):
+        return [Path(stem_dir) / fn for fn in man['stems'].values()]
+    return list(Path(stem_dir).glob('*.wav'))
 
 def collect_stems(stem_dir: Path) -> dict:
-    files = list(Path(stem_dir).glob('*.wav'))
+    files = _stem_files(stem_dir)
     rel = {}
     for f in files:
         name = f.stem.lower()
@@ -361,7 +577,7 @@ def collect_stems(stem_dir: Path) -> dict:
 def pick_vocals_stem(stem_dir: Path):
     """Prefer true vocal stems, never 'no_vocals'."""
     names_exact = {'vocals', 'lead_vocals', 'vocal', 'vox'}
-    for f in Path(stem_dir).glob('*.wav'):
+    for f in _stem_files(stem_dir):
         stem = f.stem.lower()
         if stem in names_exact or stem.endswith('- vocals'):
             return str(f)
@@ -370,7 +586,7 @@ def pick_vocals_stem(stem_dir: Path):
 def pick_instrumental_2stem(stem_dir: Path):
     """For 2-stem demucs: prefer 'no_vocals' / 'accompaniment' / 'instrumental'."""
     prefer = ['no_vocals', 'accompaniment', 'instrumental']
-    files = list(Path(stem_dir).glob('*.wav'))
+    files = _stem_files(stem_dir)
     for name in prefer:
         for f in files:
             if f.stem.lower() == name:
@@ -380,10 +596,335 @@ def pick_instrumental_2stem(stem_dir: Path):
             return str(f)
     return None
 
+# Stem cache: STEMS_OUTPUT/cache/<sha256>_<mode>_<model>/{manifest.json, *.wav}
+STEM_CACHE_DIR   = os.path.join(STEMS_OUTPUT, 'cache')
+STEM_CACHE_BYTES = int(os.environ.get('SLITOEX_STEM_CACHE_BYTES', str(5 * 1024**3)))
+STEM_CACHE_GRACE_S = float(os.environ.get('SLITOEX_STEM_CACHE_GRACE', '300'))  # never evict what was just used
+STEM_PIN_TTL_S     = 6 * 3600.0   # a pin this old belongs to a process that died
+
+def _stem_cache_entry(digest, mode):
+    return Path(STEM_CACHE_DIR) / f"{digest}_{_demucs_mode(mode)}_{secure_filename(DEMUCS_MODEL)}"
+
+def _write_manifest(entry: Path, manifest: dict):
+    tmp = entry / 'manifest.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp, entry / 'manifest.json')
+
+def _read_manifest(entry: Path):
+    try:
+        with open(entry / 'manifest.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+@contextmanager
+def _manifest_lock(entry: Path):
+    """
+    Exclusive lock for a read-modify-write of an entry's manifest, held across
+    threads and server processes. Raises OSError if the entry is gone.
+    """
+    with open(entry / '.lock', 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _stem_cache_lookup(digest, mode):
+    """Cached stem dir for this content/mode/model, or None. Refreshes its LRU stamp."""
+    entry = _stem_cache_entry(digest, mode)
+    if not entry.is_dir():
+        return None
+    try:
+        with _manifest_lock(entry):
+            man = _read_manifest(entry)
+            if not man or not all((entry / fn).exists() for fn in man.get('stems', {}).values()):
+                return None
+            man['last_used'] = time.time()
+            try:
+                _write_manifest(entry, man)
+            except OSError:
+                pass
+    except OSError:   # evicted meanwhile
+        return None
+    return entry
+
+@contextmanager
+def stem_pins(*dirs):
+    """
+    Hold stem cache entries against eviction while a request reads from them.
+    Pins are files inside the entry, so they hold across worker processes.
+    """
+    pins = []
+    try:
+        for d in dirs:
+            if d is None or not Path(d).is_dir():
+                continue
+            pin = Path(d) / f".pin-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            try:
+                pin.touch()
+                pins.append(pin)
+            except OSError:
+                pass
+        yield
+    finally:
+        for pin in pins:
+            try:
+                pin.unlink()
+            except OSError:
+                pass
+        for pin in pins:
+            _stem_drop_stale(pin.parent)
+
+def _stem_pinned(entry: Path) -> bool:
+    now = time.time()
+    for pin in entry.glob('.pin-*'):
+        try:
+            if now - pin.stat().st_mtime < STEM_PIN_TTL_S:
+                return True
+        except OSError:
+            pass
+    return False
+
+def _entry_bytes(entry: Path, man: dict) -> int:
+    names = set(man.get('stems', {}).values()) | set(man.get('stale', []))
+    for files in man.get('encodings', {}).values():
+        names |= set(files.values())
+    total = 0
+    for fn in names:
+        try:
+            total += (entry / fn).stat().st_size
+        except OSError:
+            pass
+    return total
+
+def _stem_drop_stale(entry: Path):
+    """Delete masters that FLAC replaced (manifest 'stale') once nothing holds the entry pinned."""
+    man = _read_manifest(entry)
+    if not man or not man.get('stale') or _stem_pinned(entry):
+        return
+    try:
+        with _manifest_lock(entry):
+            man = _read_manifest(entry)
+            # Readers pin before they read the manifest, and the manifest stopped naming
+            # these files before this check, so an unpinned entry has no reader left on them.
+            if not man or not man.get('stale') or _stem_pinned(entry):
+                return
+            for fn in man.pop('stale'):
+                (entry / fn).unlink(missing_ok=True)
+            man['bytes'] = _entry_bytes(entry, man)
+            _write_manifest(entry, man)
+    except OSError as e:
+        print(f"[STEMS] could not drop old masters of {entry.name}:", e)
+
+def _stem_cache_evict(keep=None):
+    """
+    Drop least recently used entries until under STEM_CACHE_BYTES. Entries that are
+    pinned, or were looked up in the last STEM_CACHE_GRACE_S (a request between its
+    lookup and its pin), are skipped.
+    """
+    entries = []
+    total = 0
+    now = time.time()
+    for d in Path(STEM_CACHE_DIR).iterdir():
+        man = _read_manifest(d) if d.is_dir() else None
+        if man is None:
+            continue
+        total += int(man.get('bytes', 0))
+        entries.append((float(man.get('last_used', 0.0)), int(man.get('bytes', 0)), d))
+    for last_used, size, d in sorted(entries, key=lambda e: e[0]):
+        if total <= STEM_CACHE_BYTES:
+            break
+        if (keep is not None and d == keep) or now - last_used < STEM_CACHE_GRACE_S or _stem_pinned(d):
+            continue
+        shutil.rmtree(d, ignore_errors=True)
+        total -= size
+
+def _stem_cache_store(digest, mode, out_dir: Path, stems: dict) -> Path:
+    """Move the stems of a finished Demucs job into the cache and write its manifest."""
+    entry = _stem_cache_entry(digest, mode)
+    staging = Path(STEM_CACHE_DIR) / f".{entry.name}.{uuid.uuid4().hex[:8]}"
+    staging.mkdir(parents=True, exist_ok=True)
+    size = 0
+    for fn in stems.values():
+        dest = staging / fn
+        shutil.move(str(Path(out_dir) / fn), str(dest))
+        size += dest.stat().st_size
+    now = time.time()
+    _write_manifest(staging, {"digest": digest, "mode": _demucs_mode(mode), "model": DEMUCS_MODEL,
+                              "stems": stems, "bytes": size, "created": now, "last_used": now})
+    for _ in range(2):
+        try:
+            os.replace(staging, entry)
+            break
+        except OSError:
+            if _stem_cache_lookup(digest, mode) is not None:
+                # Another request cached the same track first; keep theirs.
+                shutil.rmtree(staging, ignore_errors=True)
+                break
+            # A stale or partial entry is in the way: clear it and try once more.
+            shutil.rmtree(entry, ignore_errors=True)
+    else:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise RuntimeError(f"could not store stems in the cache at {entry}")
+    _stem_cache_evict(keep=entry)
+    return entry
+
+def separate_cached(input_path: str, mode: str = '2stem', digest: str = None, chunk_s=None, scratch=None):
+    """
+    run_demucs behind the content-hash stem cache. Returns (stem_dir, cache_hit).
+    scratch: separate into this directory instead of storing a cache entry, for
+    throwaway inputs (preview clips) that must not push real tracks out of the cache.
+    """
+    if scratch is not None:
+        out_dir, stems = run_demucs(input_path, mode, out_dir=scratch, chunk_s=chunk_s)
+        _write_manifest(Path(out_dir), {"mode": _demucs_mode(mode), "model": DEMUCS_MODEL, "stems": stems})
+        return Path(out_dir), False
+    if digest is None:
+        with open(input_path, 'rb') as fh:
+            digest = _file_digest(fh)
+    hit = _stem_cache_lookup(digest, mode)
+    if hit is not None:
+        return hit, True
+    job_dir = Path(STEMS_OUTPUT) / 'jobs' / uuid.uuid4().hex
+    try:
+        out_dir, stems = run_demucs(input_path, mode, out_dir=job_dir, chunk_s=chunk_s)
+        return _stem_cache_store(digest, mode, out_dir, stems), False
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+def separate_pair(a_path: str, b_path: str, mode: str = '2stem', progress=None, scratch=(None, None)):
+    """
+    separate_cached for two tracks at once; each lands on its own Demucs worker.
+    Identical uploads are separated once. scratch: per-track scratch dirs (see
+    separate_cached). Returns ((a_dir, hit), (b_dir, hit)).
+    """
+    report = progress or (lambda done: None)
+    digests = []
+    for p in (a_path, b_path):
+        with open(p, 'rb') as fh:
+            digests.append(_file_digest(fh))
+    if digests[0] == digests[1] and scratch[0] == scratch[1]:
+        res = separate_cached(a_path, mode, digest=digests[0], scratch=scratch[0])
+        report(2)
+        return res, res
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="slitoex-split") as ex:
+        futs = [ex.submit(separate_cached, p, mode, d, None, sc)
+                for p, d, sc in zip((a_path, b_path), digests, scratch)]
+        for k, fut in enumerate(as_completed(futs), 1):
+            fut.result()
+            report(k)
+        return futs[0].result(), futs[1].result()
+
+# Stem encodings: the lossless master stays in the manifest's "stems"; playback/download
+# copies live under "encodings" and are produced once per entry.
+# name: (container, subtype, extension, mimetype, libsndfile compression level)
+STEM_FORMATS = {
+    'wav':  ('WAV',  'PCM_16',         '.wav',  'audio/wav',  None),
+    'flac': ('FLAC', 'PCM_16',         '.flac', 'audio/flac', None),
+    'opus': ('OGG',  'OPUS',           '.opus', 'audio/ogg',  0.85),  # ≈ 90 kbps stereo
+    'mp3':  ('MP3',  'MPEG_LAYER_III', '.mp3',  'audio/mpeg', 0.6),   # ≈ 120 kbps
+}
+STEM_ENCODINGS  = [e.strip() for e in os.environ.get('SLITOEX_STEM_ENCODINGS', 'flac,opus').split(',')
+                   if e.strip() in STEM_FORMATS]
+STEM_KEEP_WAV   = os.environ.get('SLITOEX_STEM_KEEP_WAV', '0') == '1'
+_stem_encode_lock = threading.Lock()   # one encode at a time per process
+
+def _encode_stem(src: Path, dest: Path, fmt: str):
+    """Stream-transcode one stem with libsndfile (Opus is resampled to 48 kHz)."""
+    container, subtype, _, _, level = STEM_FORMATS[fmt]
+    import soxr
+    # Unique temp name: another server process may be encoding the same stem.
+    tmp = dest.with_name(f"{dest.name}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        with sf.SoundFile(str(src)) as fin:
+            rate = fin.samplerate
+            out_rate = 48000 if fmt == 'opus' and rate not in (8000, 12000, 16000, 24000, 48000) else rate
+            kw = {'compression_level': level} if level is not None else {}
+            rs = soxr.ResampleStream(rate, out_rate, fin.channels, dtype='float32') if out_rate != rate else None
+            with sf.SoundFile(str(tmp), 'w', samplerate=out_rate, channels=fin.channels,
+                              format=container, subtype=subtype, **kw) as fout:
+                for blk in fin.blocks(blocksize=1 << 16, dtype='float32', always_2d=True):
+                    fout.write(rs.resample_chunk(blk) if rs else blk)
+                if rs:
+                    fout.write(rs.resample_chunk(np.zeros((0, fin.channels), np.float32), last=True))
+        os.replace(tmp, dest)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+def _stem_encode(entry: Path, formats) -> dict:
+    """
+    Make sure every stem of a cache entry exists in each of `formats`.
+    Once FLAC exists it becomes the lossless master that remixes read, and the WAV
+    masters are dropped (unless SLITOEX_STEM_KEEP_WAV=1) as soon as no request
+    holds the entry pinned. Encoding runs with the entry pinned and outside the
+    manifest lock; only the manifest update takes it.
+    """
+    with _stem_encode_lock, stem_pins(entry):
+        man = _read_manifest(entry)
+        if not man:
+            return {}
+        made = {}
+        for fmt in formats:
+            if fmt not in STEM_FORMATS or fmt in man.get('encodings', {}):
+                continue
+            ext = STEM_FORMATS[fmt][2]
+            files = {}
+            for name, fn in man['stems'].items():
+                if Path(fn).suffix == ext:
+                    files[name] = fn
+                    continue
+                try:
+                    _encode_stem(entry / fn, entry / f"{name}{ext}", fmt)
+                except Exception as e:
+                    print(f"[STEMS] {fmt} encode failed for {entry.name}/{fn}:", e)
+                    files = None
+                    break
+                files[name] = f"{name}{ext}"
+            if files:
+                made[fmt] = files
+
+        try:
+            with _manifest_lock(entry):
+                man = _read_manifest(entry)
+                if not man:
+                    return {}
+                encs = man.setdefault('encodings', {})
+                for fmt, files in made.items():
+                    encs.setdefault(fmt, files)
+                if 'flac' in encs and not STEM_KEEP_WAV and any(fn.endswith('.wav') for fn in man['stems'].values()):
+                    # Stop naming the WAVs first; _stem_drop_stale deletes them once unpinned.
+                    man['stale'] = sorted(set(man.get('stale', []))
+                                          | {fn for fn in man['stems'].values() if fn.endswith('.wav')})
+                    man['stems'] = dict(encs['flac'])
+                    encs.pop('wav', None)
+                encs.setdefault(Path(next(iter(man['stems'].values()))).suffix.lstrip('.'), dict(man['stems']))
+                man['bytes'] = _entry_bytes(entry, man)
+                _write_manifest(entry, man)
+                return encs
+        except OSError:   # evicted meanwhile
+            return {}
+
 # ─── Remix & Analysis DSP helpers ─────────────────
 from tempfile import TemporaryDirectory
 import uuid
 import numpy as np, soundfile as sf, librosa
+from scipy.ndimage import median_filter
 import shutil
 
 # Optional time-stretch/pitch-shift: pyrubberband (needs Rubber Band CLI on PATH)
@@ -393,94 +934,205 @@ try:
 except Exception:
     HAVE_RB = False
 
+# Preferred: Rubber Band in-process (pylibrb) — no temp WAVs, no subprocess.
+try:
+    import pylibrb
+    HAVE_LIBRB = True
+except Exception:
+    HAVE_LIBRB = False
+RB_ENGINE = os.environ.get('SLITOEX_RB_ENGINE', 'finer')   # finer (R3) | faster (R2; pitch drifts on tonal material)
+
 # Optional madmom for robust tempo (if installed)
 try:
     from madmom.features.beats import RNNBeatProcessor, DBNBeatTrackingProcessor
+    from madmom.audio.signal import Signal as MadmomSignal
+    from madmom.models import BEATS_BLSTM
     HAVE_MADMOM = True
 except Exception:
     HAVE_MADMOM = False
 
+# Rate for tempo/key/alignment in make_remix (render stays at full rate); 0 = render rate
+ANALYSIS_SR = int(os.environ.get('SLITOEX_ANALYSIS_SR', '22050'))
+
+# 1 → single BLSTM instead of the 8-network ensemble (much cheaper activation)
+MADMOM_FAST = os.environ.get('SLITOEX_MADMOM_FAST', '0') == '1'
+
 MAJ = np.array([6.35,2.23,3.48,2.33,4.38,4.09,2.52,5.19,2.39,3.66,2.29,2.88])
 MIN = np.array([6.33,2.68,3.52,5.38,2.60,3.53,2.54,4.75,3.98,2.69,3.34,3.17])
 NAMES = ['C','C#','D','Eb','E','F','F#','G','Ab','A','Bb','B']
 
-def _tempo_madmom(y, sr):
+_madmom_procs = {}
+_madmom_lock = threading.Lock()
+
+def _madmom_processors(fast=False):
+    """(RNN, DBN) processors, built once per process; building them loads the models."""
+    procs = _madmom_procs.get(fast)
+    if procs is None:
+        with _madmom_lock:
+            procs = _madmom_procs.get(fast)
+            if procs is None:
+                nn_files = BEATS_BLSTM[:1] if fast else None
+                procs = (RNNBeatProcessor(nn_files=nn_files), DBNBeatTrackingProcessor(fps=100))
+                _madmom_procs[fast] = procs
+    return procs
+
+def _tempo_madmom(y, sr, fast=None):
     if not HAVE_MADMOM:
         return 0.0
     try:
-        with TemporaryDirectory() as td:
-            path = os.path.join(td, 'tmp.wav')
-            sf.write(path, y.astype(np.float32), sr)
-            act = RNNBeatProcessor()(path)
-            beats = DBNBeatTrackingProcessor(fps=100)(act)
-            if len(beats) >= 2:
-                itv = np.diff(beats)
-                itv = itv[itv > 0]
-                if itv.size:
-                    bpm = 60.0 / float(np.median(itv))
-                    while bpm > 180.0: bpm /= 2.0
-                    while 0.0 < bpm < 70.0: bpm *= 2.0
-                    return float(bpm)
+        rnn, dbn = _madmom_processors(MADMOM_FAST if fast is None else fast)
+        y = np.asarray(y, dtype=np.float32)
+        # The RNN's filterbank is trained for 44.1 kHz input.
+        if sr != 44100:
+            y = librosa.resample(y=y, orig_sr=sr, target_sr=44100)
+        act = rnn(MadmomSignal(y, sample_rate=44100, num_channels=1))
+        beats = dbn(act)
+        if len(beats) >= 2:
+            itv = np.diff(beats)
+            itv = itv[itv > 0]
+            if itv.size:
+                bpm = 60.0 / float(np.median(itv))
+                while bpm > 180.0: bpm /= 2.0
+                while 0.0 < bpm < 70.0: bpm *= 2.0
+                return float(bpm)
     except Exception as e:
         print("madmom tempo failed:", e)
     return 0.0
 
-def _tempo(y, sr):
-    y = np.asarray(y, dtype=np.float32)
-    if y.ndim > 1:
-        y = np.mean(y, axis=1)
-    y = librosa.util.normalize(y)
+class _Feats:
+    """
+    Lazily built analysis features for one mono signal.
+    STFT, HPSS components, onset envelopes and chroma are computed at most once
+    and shared by _tempo / _key / _beat_times / _first_strong_onset_time.
+    HPSS runs on librosa's default STFT (as librosa.effects.hpss does);
+    onset envelopes are cached per hop (default `hop`).
+    """
+    def __init__(self, y, sr, hop=512):
+        y = np.asarray(y, dtype=np.float32)
+        if y.ndim > 1:
+            y = np.mean(y, axis=1)
+        self.y = librosa.util.normalize(y)
+        self.sr, self.hop = sr, hop
+        self._memo = {}
+
+    def _get(self, key, build):
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+
+    def stft(self):
+        return self._get('stft', lambda: librosa.stft(self.y))
+
+    def _medians(self):
+        # The expensive part of HPSS; masks for any margin are derived from these.
+        def build():
+            mag = np.abs(self.stft())
+            harm = median_filter(mag, size=(1, 31), mode='reflect')
+            perc = median_filter(mag, size=(31, 1), mode='reflect')
+            return harm, perc
+        return self._get('medians', build)
+
+    def component(self, name, margin=(1.0, 1.0)):
+        """Time-domain 'harmonic' / 'percussive' part (or the signal itself for 'full')."""
+        if name == 'full':
+            return self.y
+        def build():
+            harm, perc = self._medians()
+            mh, mp = margin
+            split_zeros = mh == 1 and mp == 1
+            if name == 'harmonic':
+                mask = librosa.util.softmask(harm, perc * mh, power=2.0, split_zeros=split_zeros)
+            else:
+                mask = librosa.util.softmask(perc, harm * mp, power=2.0, split_zeros=split_zeros)
+            return librosa.istft(self.stft() * mask, dtype=self.y.dtype, length=len(self.y))
+        return self._get(('part', name, margin), build)
+
+    def onset_env(self, name='full', margin=(1.0, 1.0), hop=None):
+        hop = hop or self.hop
+        return self._get(('oenv', name, margin, hop),
+                         lambda: librosa.onset.onset_strength(y=self.component(name, margin),
+                                                              sr=self.sr, hop_length=hop))
+
+    def chroma(self):
+        def build():
+            y_h = self.component('harmonic')
+            try:
+                tune = float(librosa.estimate_tuning(y=y_h, sr=self.sr))
+            except Exception:
+                tune = 0.0
+            return librosa.feature.chroma_cqt(y=y_h, sr=self.sr, tuning=tune, norm=None)
+        return self._get('chroma', build)
+
+def _hop_for(sr, hop_44k=512):
+    """Hop that keeps the 44.1 kHz frame duration at other analysis rates."""
+    return max(64, int(round(hop_44k * sr / 44100.0)))
+
+def _feats_for(y, sr, hop=512, feats=None):
+    # HPSS is hop-independent, so any bundle at this rate will do; callers pass their hop.
+    if feats is not None and feats.sr == sr:
+        return feats
+    return _Feats(y, sr, hop=hop)
+
+def _tempo_curve(oenv, sr, hop=512, win_s=15.0, start_bpm=120.0, std_bpm=1.0, max_bpm=320.0):
+    """
+    Local tempo per win_s window, read from one tempogram over the whole
+    onset envelope (same log-normal prior as librosa's tempo()).
+    Returns (window start times in s, bpm per window); windows < 24 frames are dropped.
+    """
+    win_frames = max(1, int((win_s * sr) / hop))
+    starts = np.arange(0, len(oenv), win_frames)
+    lens = np.minimum(win_frames, len(oenv) - starts)
+    keep = lens >= 24
+    starts, lens = starts[keep], lens[keep]
+    if starts.size == 0:
+        return np.zeros(0), np.zeros(0)
+    ac = int(librosa.time_to_frames(8.0, sr=sr, hop_length=hop))
+    tg = librosa.feature.tempogram(onset_envelope=oenv, sr=sr, hop_length=hop, win_length=ac)
+    tg = tg[:, :starts[-1] + lens[-1]]
+    means = np.add.reduceat(tg, starts, axis=1) / lens
+    bpms = librosa.tempo_frequencies(tg.shape[0], sr=sr, hop_length=hop)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logprior = -0.5 * ((np.log2(bpms) - np.log2(start_bpm)) / std_bpm) ** 2
+    logprior[~(bpms < max_bpm)] = -np.inf
+    best = np.argmax(np.log1p(1e6 * means) + logprior[:, None], axis=0)
+    return librosa.frames_to_time(starts, sr=sr, hop_length=hop), bpms[best]
+
+def _local_tempo(y, sr, feats=None, win_s=15.0):
+    """Per-window tempo curve (times, bpms) of y; use it to spot tempo drift."""
+    hop = _hop_for(sr)
+    feats = _feats_for(y, sr, hop, feats)
+    try:
+        y_p, y_h = feats.component('percussive'), feats.component('harmonic')
+        pick = 'percussive' if np.std(y_p) >= 0.6*np.std(y_h) else 'harmonic'
+        oenv = feats.onset_env(pick, hop=hop)
+    except Exception:
+        oenv = feats.onset_env('full', hop=hop)
+    if oenv.size < 24:
+        return np.zeros(0), np.zeros(0)
+    return _tempo_curve(oenv, sr, hop=hop, win_s=win_s)
 
-    bpm_mm = _tempo_madmom(y, sr)
+def _tempo(y, sr, feats=None):
+    feats = _feats_for(y, sr, _hop_for(sr), feats)
+
+    bpm_mm = _tempo_madmom(feats.y, sr)
     if bpm_mm > 0:
         return bpm_mm
 
-    try:
-        y_p = librosa.effects.percussive(y)
-        y_h = librosa.effects.harmonic(y)
-        pick = y_p if np.std(y_p) >= 0.6*np.std(y_h) else y_h
-    except Exception:
-        pick = y
-
-    hop = 512
-    oenv = librosa.onset.onset_strength(y=pick, sr=sr, hop_length=hop)
-    if oenv.size < 24:
+    _, curve = _local_tempo(y, sr, feats=feats)
+    if curve.size == 0:
         return 0.0
 
-    win_frames = int((15.0 * sr) / hop)
-    bpms = []
-    for start in range(0, len(oenv), win_frames):
-        seg = oenv[start:start+win_frames]
-        if len(seg) < 24:
-            break
-        cand = librosa.beat.tempo(onset_envelope=seg, sr=sr, hop_length=hop, aggregate=None)
-        if cand is not None and len(cand) > 0:
-            bpms.append(float(cand[0]))
-    if not bpms:
-        cand = librosa.beat.tempo(onset_envelope=oenv, sr=sr, hop_length=hop, aggregate=None)
-        if cand is None or len(cand) == 0:
-            return 0.0
-        bpms = [float(cand[0])]
-
-    bpm = float(np.median(bpms))
+    bpm = float(np.median(curve))
     while bpm > 180.0: bpm /= 2.0
     while 0.0 < bpm < 70.0: bpm *= 2.0
     return bpm
 
-def _key(y, sr):
-    y = np.asarray(y, dtype=np.float32)
-    if y.ndim > 1:
-        y = np.mean(y, axis=1)
-    y = librosa.util.normalize(y)
-    try:
-        y_h = librosa.effects.harmonic(y)
-    except Exception:
-        y_h = y
+def _key(y, sr, feats=None):
+    feats = _feats_for(y, sr, feats=feats)
     try:
-        tune = float(librosa.estimate_tuning(y=y_h, sr=sr))
+        chroma = feats.chroma()
     except Exception:
-        tune = 0.0
-    chroma = librosa.feature.chroma_cqt(y=y_h, sr=sr, tuning=tune, norm=None)
+        chroma = librosa.feature.chroma_cqt(y=feats.y, sr=sr, norm=None)
     chroma = librosa.decompose.nn_filter(chroma, aggregate=np.median, metric='cosine')
     chroma = chroma / (np.sum(chroma, axis=0, keepdims=True) + 1e-9)
     chroma_mean = np.median(chroma, axis=1)
@@ -503,33 +1155,85 @@ def _semi(src_tonic, src_major, tgt_tonic, tgt_major):
         if (not src_major) and tgt_tonic == (src_tonic+3)%12: d = 3
     return float(d)
 
-def _tstretch(y, sr, rate):
+def _rb_inprocess(y, sr, rate, semit, block=1 << 16):
+    """Offline Rubber Band through pylibrb: study + process in blocks, all in memory."""
+    opts = pylibrb.Option.PROCESS_OFFLINE | (pylibrb.Option.ENGINE_FASTER if RB_ENGINE == 'faster'
+                                              else pylibrb.Option.ENGINE_FINER)
+    st = pylibrb.RubberBandStretcher(sample_rate=int(sr), channels=1, options=opts,
+                                     initial_time_ratio=1.0 / rate,
+                                     initial_pitch_scale=2.0 ** (float(semit) / 12.0))
+    x = np.ascontiguousarray(y, dtype=np.float32)[None, :]
+    n = x.shape[1]
+    st.set_expected_input_duration(n)
+    st.set_max_process_size(block)
+    for k in range(0, n, block):
+        st.study(x[:, k:k+block], final=k + block >= n)
+    out = []
+    for k in range(0, n, block):
+        st.process(x[:, k:k+block], final=k + block >= n)
+        out.append(st.retrieve_available())
+    while st.available() > 0:
+        out.append(st.retrieve_available())
+    return np.concatenate(out, axis=1)[0] if out else np.zeros(0, np.float32)
+
+def _stretch_shift_engine(y, sr, rate, semit):
+    """
+    Time-stretch by `rate` and pitch-shift by `semit` in one pass. Returns (y, engine):
+    'rubberband-lib' (in-process) → 'rubberband-cli' (pyrubberband, temp files) → 'librosa'.
+    The librosa path is one phase-vocoder stretch by rate/p then one resample by p.
+    """
     if not np.isfinite(rate) or rate <= 0:
         rate = 1.0
-    if HAVE_RB:
+    out, engine = None, 'librosa'
+    if HAVE_LIBRB:
+        try:
+            out, engine = _rb_inprocess(y, sr, rate, semit), 'rubberband-lib'
+        except Exception as e:
+            print("[STRETCH] in-process Rubber Band failed:", e)
+    if out is None and HAVE_RB:
         try:
-            return pyrb.time_stretch(y, sr, rate)
+            out, engine = pyrb.time_stretch(y, sr, rate, rbargs={'--pitch': semit}), 'rubberband-cli'
         except Exception as e:
-            print("Rubber Band failed, falling back to librosa:", e)
+            print("[STRETCH] Rubber Band CLI failed:", e)
+    if out is None:
+        if HAVE_LIBRB or HAVE_RB:
+            print("[STRETCH] falling back to librosa (slow path)")
+        p = 2.0 ** (float(semit) / 12.0)
+        if abs(semit) < 1e-6:
+            out = librosa.effects.time_stretch(y=y, rate=rate)
+        else:
+            y_st = librosa.effects.time_stretch(y=y, rate=rate / p)
+            y_rs = librosa.resample(y_st, orig_sr=float(sr) * p, target_sr=sr)
+            out = librosa.util.fix_length(y_rs, size=int(round(len(y) / rate)))
+    return out, engine
+
+def _stretch_shift(y, sr, rate, semit):
+    """Same length and pitch as _pshift(_tstretch(y, sr, rate), sr, semit), one pass."""
+    return _stretch_shift_engine(y, sr, rate, semit)[0]
+
+def _tstretch(y, sr, rate):
+    if not np.isfinite(rate) or rate <= 0:
+        rate = 1.0
+    if HAVE_LIBRB or HAVE_RB:
+        return _stretch_shift(y, sr, rate, 0.0)
     return librosa.effects.time_stretch(y=y, rate=rate)
 
 def _pshift(y, sr, semit):
-    if HAVE_RB:
-        try:
-            return pyrb.pitch_shift(y, sr, semit)
-        except Exception as e:
-            print("Rubber Band failed, falling back to librosa:", e)
+    if HAVE_LIBRB or HAVE_RB:
+        return _stretch_shift(y, sr, 1.0, semit)
     return librosa.effects.pitch_shift(y=y, sr=sr, n_steps=semit)
 
-def _first_strong_onset_time(y, sr, hop=512, max_seek_s=45.0):
-    y = np.asarray(y)
-    yt, _ = librosa.effects.trim(y, top_db=30)
-    if len(yt) < sr*0.5:
-        yt = y
-    yt = yt[:int(sr*max_seek_s)]
-    if len(yt) < hop*4:
+def _first_strong_onset_time(y, sr, hop=512, max_seek_s=45.0, feats=None):
+    feats = _feats_for(y, sr, hop, feats)
+    y = feats.y
+    _, (start, end) = librosa.effects.trim(y, top_db=30)
+    if end - start < sr*0.5:
+        start, end = 0, len(y)
+    end = min(end, start + int(sr*max_seek_s))
+    if end - start < hop*4:
         return 0.0
-    oenv = librosa.onset.onset_strength(y=yt, sr=sr, hop_length=hop)
+    # Onset frames of the trimmed window, read off the shared full-signal envelope.
+    oenv = feats.onset_env('full', hop=hop)[start // hop:(end + hop - 1) // hop]
     if oenv.size < 16:
         return 0.0
     mu, sd = float(np.mean(oenv)), float(np.std(oenv) + 1e-8)
@@ -541,22 +1245,44 @@ def _first_strong_onset_time(y, sr, hop=512, max_seek_s=45.0):
         min_start = int(np.ceil(0.2 * sr / hop))
         candidates = frames[frames >= min_start]
         idx = int(candidates[0]) if candidates.size else int(frames[0])
-    t = librosa.frames_to_time(idx, sr=sr, hop_length=hop)
+    # Report in signal time, not relative to the trimmed head.
+    t = librosa.frames_to_time(idx, sr=sr, hop_length=hop) + (start // hop) * hop / sr
     return float(max(0.0, t))
 
-def _beat_times(y, sr, hop=512, start_bpm=None):
+def _beat_times(y, sr, hop=512, start_bpm=None, feats=None, max_s=None):
+    feats = _feats_for(y, sr, hop, feats)
     try:
-        _, y_p = librosa.effects.hpss(y, margin=(1.0, 3.0))
+        oenv = feats.onset_env('percussive', margin=(1.0, 3.0), hop=hop)
     except Exception:
-        y_p = y
-    oenv = librosa.onset.onset_strength(y=y_p, sr=sr, hop_length=hop)
+        oenv = feats.onset_env('full', hop=hop)
+    if max_s is not None:
+        oenv = oenv[:int(max_s * sr / hop) + 1]
     tempo, beats = librosa.beat.beat_track(onset_envelope=oenv, sr=sr, hop_length=hop,
                                            start_bpm=start_bpm or 120.0, units='frames')
     times = librosa.frames_to_time(beats, sr=sr, hop_length=hop)
-    return float(tempo), times
+    return float(np.atleast_1d(tempo)[0]), times
 
 from PIL import Image, ImageFilter as _ImageFilter  # alias to avoid confusion
 
+def _upscale4k_image(raw: bytes) -> str:
+    """Upscale an encoded image to a 3840 px long edge and sharpen; returns a WebP data URL."""
+    src = Image.open(BytesIO(raw)).convert('RGB')
+
+    w, h = src.size
+    long_edge = max(w, h)
+    target_long = 3840
+    if long_edge < target_long:
+        scale = target_long / float(long_edge)
+        tw, th = int(round(w*scale)), int(round(h*scale))
+        img = src.resize((tw, th), Image.LANCZOS)
+    else:
+        img = src
+
+    img = img.filter(_ImageFilter.UnsharpMask(radius=2.4, percent=160, threshold=3))
+    img = img.filter(_ImageFilter.UnsharpMask(radius=0.8, percent=80, threshold=0))
+
+    return _to_webp_dataurl(img, quality=max(80, WEBP_QUALITY))
+
 @app.post('/api/upscale4k')
 def upscale4k():
     data = request.json or {}
@@ -566,53 +1292,92 @@ def upscale4k():
 
     try:
         _, b64 = data_url.split(',', 1)
-        src = Image.open(BytesIO(base64.b64decode(b64))).convert('RGB')
-
-        w, h = src.size
-        long_edge = max(w, h)
-        target_long = 3840
-        if long_edge < target_long:
-            scale = target_long / float(long_edge)
-            tw, th = int(round(w*scale)), int(round(h*scale))
-            img = src.resize((tw, th), Image.LANCZOS)
-        else:
-            img = src
-
-        img = img.filter(_ImageFilter.UnsharpMask(radius=2.4, percent=160, threshold=3))
-        img = img.filter(_ImageFilter.UnsharpMask(radius=0.8, percent=80, threshold=0))
-
-        out = _to_webp_dataurl(img, quality=max(80, WEBP_QUALITY))
+        out = dsp_call(_upscale4k_image, base64.b64decode(b64), timeout=DSP_TIMEOUT_SHORT)
         return jsonify({'dataUrl': out})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def _align_simple(v, i, sr):
+def _shift_to(v, shift, n):
+    """v delayed by `shift` samples (advanced if negative), cropped/zero-padded to n."""
+    if shift >= 0: vv = np.pad(v, (shift, 0))
+    else:          vv = v[-shift:]
+    if len(vv) > n: vv = vv[:n]
+    elif len(vv) < n: vv = np.pad(vv, (0, n-len(vv)))
+    return vv
+
+def _align_simple_offset(v, i, sr):
+    """Global onset cross-correlation lag, in seconds (positive delays the vocal)."""
     hop=512
     seg = int(min(len(v), len(i), int(90*sr)))
     ov = librosa.onset.onset_strength(y=v[:seg], sr=sr, hop_length=hop)
     oi = librosa.onset.onset_strength(y=i[:seg], sr=sr, hop_length=hop)
     L  = max(len(ov), len(oi))
     if L < 24:
-        vv = v
-        return vv[:len(i)] if len(vv)>len(i) else np.pad(vv,(0,len(i)-len(vv)))
+        return 0.0
     ov = np.pad(ov,(0,L-len(ov))); oi = np.pad(oi,(0,L-len(oi)))
     lag = np.argmax(np.correlate(ov-ov.mean(), oi-oi.mean(), mode='full')) - (len(ov)-1)
-    offset = int(lag*hop)
-    if offset>=0: vv = np.pad(v,(offset,0))
-    else:         vv = v[-offset:]
-    vv = vv[:len(i)] if len(vv)>len(i) else np.pad(vv,(0,len(i)-len(vv)))
-    return vv
+    return float(lag*hop) / sr
 
-def _align_smart(v, i, sr):
-    hop = 512
-    MAX_ANALYZE_S = 90.0
-    v_an = v[:int(sr*MAX_ANALYZE_S)]
-    i_an = i[:int(sr*MAX_ANALYZE_S)]
-    ti, bt_i = _beat_times(i_an, sr, hop=hop)
+def _score_offsets(ov, oi, shifts):
+    """
+    Correlate the reference envelope `oi` against `ov` delayed by each frame
+    shift in `shifts`, all candidates in one vectorized pass. Returns one
+    Pearson score per shift (NaN where the shifted envelope is flat).
+    """
+    ov = np.asarray(ov, dtype=np.float32)
+    oi = np.asarray(oi, dtype=np.float32)
+    shifts = np.asarray(shifts, dtype=int)
+    idx = np.arange(len(oi))[None, :] - shifts[:, None]
+    valid = (idx >= 0) & (idx < len(ov))
+    M = np.where(valid, ov[np.clip(idx, 0, max(len(ov) - 1, 0))], 0.0)
+    M = M - M.mean(axis=1, keepdims=True)
+    sd = M.std(axis=1)
+    zi = (oi - oi.mean()) / (oi.std() + 1e-8)
+    scores = (M @ zi) / (len(oi) * (sd + 1e-8))
+    scores[sd < 1e-8] = np.nan
+    return scores
+
+ALIGN_MAX_ANALYZE_S = 90.0
+ALIGN_MAX_SEEK_S = 45.0
+
+def _inst_grid(i, sr, feats_i=None):
+    """
+    Instrumental side of _align_offset: tempo, early beat times and onset envelope.
+    Small and picklable, so one instrumental can be aligned against many vocals.
+    """
+    hop = _hop_for(sr)
+    i_an = i[:int(sr*ALIGN_MAX_ANALYZE_S)]
+    if feats_i is not None:
+        ti, bt_i = _beat_times(i, sr, hop=hop, feats=feats_i, max_s=ALIGN_MAX_ANALYZE_S)
+    else:
+        feats_i = _Feats(i_an, sr, hop=hop)
+        ti, bt_i = _beat_times(i_an, sr, hop=hop, feats=feats_i)
+    grid = {"sr": sr, "hop": hop, "tempo": ti, "beats": bt_i}
+    if bt_i.size < 4:
+        grid["head"] = np.asarray(i_an, dtype=np.float32)  # for the plain cross-correlation fallback
+    else:
+        dur = min(ALIGN_MAX_ANALYZE_S, len(i)/sr)
+        grid["oenv"] = feats_i.onset_env('full', hop=hop)[:1 + int(sr*dur) // hop]
+    return grid
+
+def _align_offset(v, i, sr, feats_i=None):
+    """
+    Seconds to delay v (negative: advance) so it sits on i's early beat grid.
+    Works at whatever rate it is given; callers map the result to render rate.
+    """
+    return _align_to_grid(v, _inst_grid(i, sr, feats_i=feats_i))
+
+def _align_to_grid(v, grid):
+    """_align_offset against a precomputed _inst_grid."""
+    sr, hop = grid["sr"], grid["hop"]
+    MAX_ANALYZE_S = ALIGN_MAX_ANALYZE_S
+    MAX_SEEK_S = ALIGN_MAX_SEEK_S
+    ti, bt_i = grid["tempo"], grid["beats"]
     if bt_i.size < 4:
-        return _align_simple(v, i, sr)
-    _, _ = _beat_times(v_an, sr, hop=hop, start_bpm=ti)
-    t_v0 = _first_strong_onset_time(v_an, sr, hop=hop, max_seek_s=45.0)
+        return _align_simple_offset(v, grid["head"], sr)
+    # Vocal head long enough to cover every candidate shift (offset - t_v0 >= -(MAX_SEEK_S + 5)).
+    feats_v = _Feats(v[:int(sr*(MAX_ANALYZE_S + MAX_SEEK_S + 5.0))], sr, hop=hop)
+    t_v0 = _first_strong_onset_time(feats_v.y, sr, hop=hop, max_seek_s=MAX_SEEK_S, feats=feats_v)
     beat_dur = 60.0 / (ti if ti > 1e-6 else 120.0)
     early_window_s = min(MAX_ANALYZE_S, 32 * beat_dur)
     anchors = bt_i[bt_i <= early_window_s]
@@ -627,125 +1392,288 @@ def _align_smart(v, i, sr):
         k = round(c, 3)
         if k not in seen and -5.0 <= c <= MAX_ANALYZE_S:
             uniq.append(c); seen.add(k)
-    candidates = uniq if uniq else [0.0]
-
-    def apply_offset(offset_s):
-        shift = int(round((offset_s - t_v0) * sr))
-        if shift >= 0: vv = np.pad(v, (shift, 0))
-        else:          vv = v[-shift:]
-        if len(vv) > len(i): vv = vv[:len(i)]
-        elif len(vv) < len(i): vv = np.pad(vv, (0, len(i)-len(vv)))
-        return vv
-
-    def score(vv):
-        dur = min(MAX_ANALYZE_S, len(i)/sr)
-        ov = librosa.onset.onset_strength(y=vv[:int(sr*dur)], sr=sr, hop_length=hop)
-        oi = librosa.onset.onset_strength(y=i [:int(sr*dur)], sr=sr, hop_length=hop)
-        L = min(len(ov), len(oi))
-        if L < 24: return -1.0
-        c = float(np.corrcoef((ov - ov.mean())/(ov.std()+1e-8),
-                              (oi - oi.mean())/(oi.std()+1e-8))[0,1])
-        return c
-
-    best_v, best_s, best_off = None, -9.0, None
-    for b in candidates:
-        vv = apply_offset(b)
-        s  = score(vv)
-        early_penalty = 0.002 * max(0.0, b)
-        s -= early_penalty
-        if np.isfinite(s) and s > best_s:
-            best_s, best_v, best_off = s, vv, b
+    candidates = np.array(uniq if uniq else [0.0])
+
+    # Score every candidate at frame resolution on envelopes computed once.
+    oi = grid["oenv"]
+    ov = feats_v.onset_env('full', hop=hop)
+    if len(oi) < 24:
+        return -t_v0
+    shifts = np.round((candidates - t_v0) * sr / hop).astype(int)
+    scores = _score_offsets(ov, oi, shifts) - 0.002 * np.maximum(0.0, candidates)
+    if not np.any(np.isfinite(scores)):
+        return -t_v0
+    best = int(np.nanargmax(scores))
+    best_off, best_s = float(candidates[best]), float(scores[best])
 
     try:
         print(f"[ALIGN] vocal_first_onset={t_v0:.3f}s  inst_anchor={best_off:.3f}s  score={best_s:.3f}")
     except Exception:
         pass
 
-    return best_v if best_v is not None else apply_offset(0.0)
+    return best_off - t_v0
+
+def _align_smart(v, i, sr, feats_i=None):
+    return _shift_to(v, int(round(_align_offset(v, i, sr, feats_i=feats_i) * sr)), len(i))
 
 def _rms(x):
     x = np.asarray(x)
     return float(np.sqrt(np.mean(np.square(x))) + 1e-12)
 
-def _match_levels(v_al, i, target_diff_db=-6.0, cap_gain=8.0):
-    rv = _rms(v_al)
-    ri = _rms(i[:len(v_al)])
-    if rv <= 1e-9 or ri <= 1e-9:
-        return v_al
-    desired = (ri/rv) * (10.0**(target_diff_db/20.0))
-    desired = float(np.clip(desired, 0.5, cap_gain))
-    return v_al * desired
+def _to_rate(y, sr, target):
+    return y if sr == target else librosa.resample(y=y, orig_sr=sr, target_sr=target)
 
-def make_remix(vocal_path, instrumental_path, out_path):
-    v, sr_v = librosa.load(vocal_path, sr=None, mono=True)
-    i, sr_i = librosa.load(instrumental_path, sr=None, mono=True)
-    sr = 44100
-    if sr_v != sr:
-        v = librosa.resample(y=v, orig_sr=sr_v, target_sr=sr)
-    if sr_i != sr:
-        i = librosa.resample(y=i, orig_sr=sr_i, target_sr=sr)
+# Remix render: blocks of this many samples; the mix is never materialised whole.
+RENDER_BLOCK = int(os.environ.get('SLITOEX_RENDER_BLOCK', str(1 << 18)))
+
+def _sumsq(x, block=RENDER_BLOCK):
+    return float(sum(np.dot(x[k:k+block].astype(np.float64), x[k:k+block].astype(np.float64))
+                     for k in range(0, len(x), block)))
 
-    t_v = _tempo(v, sr); key_v, tv, mv = _key(v, sr)
-    t_i = _tempo(i, sr); key_i, ti, mi = _key(i, sr)
+def _placed_gain(v, shift, n, i_rms, target_diff_db=-6.0, cap_gain=8.0):
+    """
+    Vocal gain that puts v, delayed by `shift` inside n samples, target_diff_db
+    under the instrumental RMS (clipped to 0.5..cap_gain). Works on the unshifted
+    vocal, so the shifted copy is never built.
+    """
+    a, b = max(0, shift), min(n, shift + len(v))
+    rv = float(np.sqrt(_sumsq(v[a-shift:b-shift]) / max(n, 1)) + 1e-12) if b > a else 1e-12
+    if rv <= 1e-9 or i_rms <= 1e-9:
+        return 1.0
+    return float(np.clip((i_rms / rv) * (10.0**(target_diff_db/20.0)), 0.5, cap_gain))
+
+def _inst_blocks(path, sr, fallback, block=RENDER_BLOCK):
+    """
+    Factory for mono instrumental blocks at sr: streamed from disk when the file is
+    already at sr (so the full array can be dropped), else sliced from `fallback`.
+    """
+    try:
+        with sf.SoundFile(path) as fh:
+            ok = fh.samplerate == sr
+    except Exception:
+        ok = False
+    if ok:
+        def gen():
+            with sf.SoundFile(path) as fh:
+                for blk in fh.blocks(blocksize=block, dtype='float32', always_2d=True):
+                    yield blk.mean(axis=1)
+        return gen, True
+    return (lambda: (fallback[k:k+block] for k in range(0, len(fallback), block))), False
+
+def _mix_blocks(inst_blocks, v, shift, v_gain, inst_gain=0.92):
+    """inst_gain*inst + v_gain*v (v delayed by `shift`), block by block over the instrumental."""
+    pos = 0
+    for ib in inst_blocks():
+        n = len(ib)
+        out = ib * np.float32(inst_gain)
+        a, b = max(pos, shift), min(pos + n, shift + len(v))
+        if b > a:
+            out[a-pos:b-pos] += np.float32(v_gain) * v[a-shift:b-shift]
+        yield out
+        pos += n
+
+def _render_mix(out_path, inst_blocks, v, shift, sr, v_gain, inst_gain=0.92, **sf_kw):
+    """Two passes over the blocks: find the mix peak, then write normalised blocks."""
+    peak = 0.0
+    for blk in _mix_blocks(inst_blocks, v, shift, v_gain, inst_gain):
+        if len(blk):
+            peak = max(peak, float(np.max(np.abs(blk))))
+    peak += 1e-12
+    scale = np.float32(1.0 / peak) if peak > 1.0 else np.float32(1.0)
+    with sf.SoundFile(out_path, 'w', samplerate=sr, channels=1, **sf_kw) as fh:
+        for blk in _mix_blocks(inst_blocks, v, shift, v_gain, inst_gain):
+            fh.write(blk * scale)
+
+def analyze_instrumental(instrumental_path, sr=None, analysis_sr=None):
+    """
+    Everything a render needs from the instrumental, computed once: render-rate
+    length and RMS, tempo, key and the alignment grid (beats + onset envelope).
+    sr=None renders at the file's own rate. The instrumental audio itself is
+    re-read from disk at render time when the file is already at sr.
+    """
+    i, sr_i = librosa.load(instrumental_path, sr=None, mono=True)
+    sr = int(sr or sr_i)
+    i = _to_rate(i, sr_i, sr)
+    # Tempo/key/alignment run on a decimated copy; only the render uses full rate.
+    asr = int(min(analysis_sr or ANALYSIS_SR or sr, sr))
+    ia = _to_rate(i, sr, asr)
+    _, streamed = _inst_blocks(instrumental_path, sr, i)
+    inst = {"path": instrumental_path, "sr": sr, "asr": asr, "n": len(i),
+            "rms": float(np.sqrt(_sumsq(i) / max(len(i), 1)) + 1e-12),
+            "samples": None if streamed else i}
+    del i
+    fi = _Feats(ia, asr)
+    inst["bpm"] = _tempo(ia, asr, feats=fi)
+    inst["key"], inst["tonic"], inst["mode"] = _key(ia, asr, feats=fi)
+    inst["grid"] = _inst_grid(ia, asr, feats_i=fi)
+    return inst
+
+def render_vocal(vocal_path, inst, out_path, progress=None):
+    """Stretch/shift/align one vocal onto an analyze_instrumental() result and mix it."""
+    report = progress or (lambda stage, frac: None)
+    sr, asr = inst["sr"], inst["asr"]
+    report('analyze', 0.3)
+    v, sr_v = librosa.load(vocal_path, sr=None, mono=True)
+    v = _to_rate(v, sr_v, sr)
+    va = _to_rate(v, sr, asr)
+    fv = _Feats(va, asr)
+    t_v = _tempo(va, asr, feats=fv); key_v, tv, mv = _key(va, asr, feats=fv)
+    del fv, va
 
+    t_i = inst["bpm"]
     if t_v > 0 and t_i > 0:
         applied_rate = float(np.clip(t_i / t_v, 0.5, 2.0))
     else:
         applied_rate = 1.0
-    v2 = _tstretch(v, sr, applied_rate)
-
-    semi = _semi(tv, mv, ti, mi)
+    semi = _semi(tv, mv, inst["tonic"], inst["mode"])
     semi = float(np.clip(semi, -6.0, 6.0))
-    v3 = _pshift(v2, sr, semi)
-
-    v_al = _align_smart(v3, i, sr)
-    v_bal = _match_levels(v_al, i, target_diff_db=-6.0)
-
-    mix = (0.92 * i[:len(v_bal)]) + (1.00 * v_bal)
-    peak = float(np.max(np.abs(mix)) + 1e-12)
-    if peak > 1.0:
-        mix = mix / peak
-
-    sf.write(out_path, mix, sr)
+    report('stretch', 0.45)
+    v3, engine = _stretch_shift_engine(v, sr, applied_rate, semi)
+    del v
+
+    report('align', 0.75)
+    offset_s = _align_to_grid(_to_rate(v3, sr, asr), inst["grid"])
+    shift = int(round(offset_s * sr))
+    report('mix', 0.9)
+    v_gain = _placed_gain(v3, shift, inst["n"], inst["rms"], target_diff_db=-6.0)
+    inst_blocks, _ = _inst_blocks(inst["path"], sr, inst["samples"])
+    _render_mix(out_path, inst_blocks, v3, shift, sr, v_gain, inst_gain=0.92)
+    report('done', 1.0)
     return {
         "vocal_bpm": float(t_v), "inst_bpm": float(t_i),
-        "vocal_key": key_v, "inst_key": key_i,
+        "vocal_key": key_v, "inst_key": inst["key"],
         "semitones": float(semi),
         "applied_time_stretch": float(applied_rate),
-        "sr": sr, "out": out_path
+        "stretch_engine": engine,
+        "sr": sr, "analysis_sr": asr, "out": out_path
+    }
+
+def make_remix(vocal_path, instrumental_path, out_path, analysis_sr=None, progress=None):
+    report = progress or (lambda stage, frac: None)
+    report('load', 0.0)
+    # Render at the stems' shared rate when they agree; otherwise 44.1 kHz.
+    sr_v, sr_i = librosa.get_samplerate(vocal_path), librosa.get_samplerate(instrumental_path)
+    sr = sr_v if sr_v == sr_i else 44100
+    report('analyze', 0.1)
+    inst = analyze_instrumental(instrumental_path, sr=sr, analysis_sr=analysis_sr)
+    return render_vocal(vocal_path, inst, out_path, progress=report)
+
+# Preview: analysis + stretch/shift on short windows only, low-bitrate MP3 out.
+PREVIEW_S        = float(os.environ.get('SLITOEX_PREVIEW_S', '30'))
+PREVIEW_OFFSET_S = float(os.environ.get('SLITOEX_PREVIEW_OFFSET_S', '30'))
+PREVIEW_MP3_LEVEL = 0.8
+
+def make_remix_preview(vocal_path, instrumental_path, out_path, preview_s=None,
+                       offset_v=0.0, offset_i=0.0, sr=44100, progress=None):
+    """
+    make_remix on a window: preview_s of instrumental from offset_i, and just enough
+    vocal (from its first onset after offset_v) to cover it once stretched.
+    """
+    report = progress or (lambda stage, frac: None)
+    preview_s = float(preview_s or PREVIEW_S)
+    report('load', 0.0)
+    v, _ = _load_snippet(vocal_path, sr=sr, offset=offset_v, duration=2.0 * preview_s)
+    i, _ = _load_snippet(instrumental_path, sr=sr, offset=offset_i, duration=preview_s)
+    if len(v) < sr or len(i) < sr or _rms(v) < 1e-6 or _rms(i) < 1e-6:
+        raise RuntimeError("stems too short or silent for a preview")
+
+    asr = int(min(ANALYSIS_SR or sr, sr))
+    report('analyze', 0.1)
+    # Vocal analysis sees preview_s too; the extra loaded audio only feeds the stretch.
+    va, ia = _to_rate(v[:int(preview_s * sr)], sr, asr), _to_rate(i, sr, asr)
+    fv, fi = _Feats(va, asr), _Feats(ia, asr)
+    t_v = _tempo(va, asr, feats=fv); key_v, tv, mv = _key(va, asr, feats=fv)
+    t_i = _tempo(ia, asr, feats=fi); key_i, ti, mi = _key(ia, asr, feats=fi)
+    applied_rate = float(np.clip(t_i / t_v, 0.5, 2.0)) if t_v > 0 and t_i > 0 else 1.0
+    semi = float(np.clip(_semi(tv, mv, ti, mi), -6.0, 6.0))
+
+    # Only the vocal that lands in the window gets stretched/shifted
+    v0 = max(0.0, _first_strong_onset_time(va, asr, hop=_hop_for(asr), feats=fv) - 0.5)
+    a = int(v0 * sr)
+    v = v[a:a + int(np.ceil(preview_s * applied_rate * sr))]
+    del fv, va
+
+    report('stretch', 0.45)
+    v, engine = _stretch_shift_engine(v, sr, applied_rate, semi)
+
+    report('align', 0.75)
+    offset_s = _align_offset(_to_rate(v, sr, asr), ia, asr, feats_i=fi)
+    del fi, ia
+    shift = int(round(offset_s * sr))
+    report('mix', 0.9)
+    i_rms = _rms(i)
+    v_gain = _placed_gain(v, shift, len(i), i_rms, target_diff_db=-6.0)
+    _render_mix(out_path, lambda: (i[k:k+RENDER_BLOCK] for k in range(0, len(i), RENDER_BLOCK)),
+                v, shift, sr, v_gain, inst_gain=0.92,
+                format='MP3', subtype='MPEG_LAYER_III', compression_level=PREVIEW_MP3_LEVEL)
+    report('done', 1.0)
+    return {
+        "vocal_bpm": float(t_v), "inst_bpm": float(t_i),
+        "vocal_key": key_v, "inst_key": key_i,
+        "semitones": semi,
+        "applied_time_stretch": applied_rate,
+        "stretch_engine": engine,
+        "sr": sr, "analysis_sr": asr, "out": out_path,
+        "preview": True, "window_s": [float(offset_i), float(offset_i) + len(i) / sr],
     }
 
 # ─── Robust short snippet loader ─────────────────────────
+def _read_pcm_f32(stream, n):
+    """Read up to n float32 samples from a binary stream straight into a preallocated array."""
+    buf = np.empty(n, dtype=np.float32)
+    view = memoryview(buf).cast('B')
+    got = 0
+    while got < len(view):
+        k = stream.readinto(view[got:])
+        if not k:
+            break
+        got += k
+    return buf[:got // 4]
+
+def _snippet_ffmpeg(path, sr, offset, duration):
+    """FFmpeg raw f32le pipe; raises if ffmpeg fails before filling the window."""
+    n = int(round(duration * sr))
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-ss", str(offset), "-t", str(duration),
+        "-i", path, "-ac", "1", "-ar", str(sr), "-f", "f32le", "-"
+    ]
+    # stderr is discarded, not piped: a damaged file logs a line per bad frame, and an
+    # unread stderr pipe would fill up and stall ffmpeg (and this read) for good.
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as p:
+        y = _read_pcm_f32(p.stdout, n)
+        p.stdout.close()
+        rc = p.wait()
+    # A full buffer means we stopped reading early; ffmpeg may then exit on EPIPE.
+    if rc != 0 and len(y) < n:
+        raise subprocess.CalledProcessError(rc, cmd)
+    return y
+
+def _snippet_soundfile(path, sr, offset, duration):
+    """soundfile seek + window read, downmixed and resampled to `sr`."""
+    with sf.SoundFile(path) as fh:
+        rate = fh.samplerate
+        fh.seek(min(int(offset * rate), fh.frames))
+        y = fh.read(int(round(duration * rate)), dtype="float32", always_2d=True)
+    y = y.mean(axis=1)
+    if rate != sr:
+        y = librosa.resample(y=y, orig_sr=rate, target_sr=sr)
+    return y.astype(np.float32)
+
 def _load_snippet(path, sr=44100, offset=0.2, duration=30.0):
     """
     Decode a short mono snippet reliably (fast).
-    Order: FFmpeg → soundfile → librosa. Return (y, sr).
+    Order: FFmpeg (raw f32le pipe) → soundfile (seek + window read) → librosa.
+    Return (y, sr).
     """
     try:
         if shutil.which("ffmpeg"):
-            cmd = [
-                "ffmpeg", "-hide_banner", "-loglevel", "error",
-                "-ss", str(offset), "-t", str(duration),
-                "-i", path, "-ac", "1", "-ar", str(sr), "-f", "wav", "-"
-            ]
-            p = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-            data, _ = sf.read(BytesIO(p.stdout), dtype="float32", always_2d=False)
-            if getattr(data, "ndim", 1) > 1:
-                data = data.mean(axis=1)
-            return data.astype(np.float32), sr
+            return _snippet_ffmpeg(path, sr, offset, duration), sr
     except Exception as e:
         print("[_load_snippet] ffmpeg decode failed →", repr(e))
 
     try:
-        y, rate = sf.read(path, dtype="float32", always_2d=False)
-        if rate != sr:
-            y = librosa.resample(y=y, orig_sr=rate, target_sr=sr)
-        if getattr(y, "ndim", 1) > 1:
-            y = y.mean(axis=1)
-        start = int(offset * sr)
-        end   = start + int(duration * sr)
-        y = y[start:end]
-        return y.astype(np.float32), sr
+        return _snippet_soundfile(path, sr, offset, duration), sr
     except Exception as e:
         print("[_load_snippet] soundfile read failed →", repr(e))
 
@@ -837,22 +1765,18 @@ def _periodogram_bpm_candidates(oenv, sr, hop, lo_bpm=40.0, hi_bpm=220.0, top_k=
     C.sort(key=lambda t: t[1], reverse=True)
     return C[:top_k]
 
-def _tempo_detail(y, sr, hop=256, band=(70.0, 180.0)):
-    y = np.asarray(y, dtype=np.float32)
-    if y.ndim > 1:
-        y = y.mean(axis=1)
-    y = librosa.util.normalize(y)
+def _tempo_detail(y, sr, hop=256, band=(70.0, 180.0), feats=None):
+    feats = _feats_for(y, sr, hop, feats)
+    y = feats.y
     lo, hi = band
     def fold(b): return _fold_bpm(b, lo, hi)
 
     try:
-        _, y_p = librosa.effects.hpss(y, margin=(1.0, 3.0))
+        oenv = feats.onset_env('percussive', margin=(1.0, 3.0), hop=hop)
     except Exception:
-        y_p = y
-
-    oenv = librosa.onset.onset_strength(y=y_p, sr=sr, hop_length=hop)
+        oenv = feats.onset_env('full', hop=hop)
     if oenv.size < 24 or np.max(oenv) < 1e-6:
-        return {"bpm": 0.0, "alt_half": 0.0, "alt_double": 0.0, "confidence": 0.0, "method": "insufficient", "candidates": []}
+        return {"bpm": 0.0, "alt_half": 0.0, "alt_double": 0.0, "confidence": 0.0, "method": "insufficient", "candidates": [], "beats": []}
 
     candidates = []
     method = "fusion"
@@ -874,10 +1798,12 @@ def _tempo_detail(y, sr, hop=256, band=(70.0, 180.0)):
         for bpm, s in sp_cands:
             candidates.append((fold(bpm), 1.15 + 0.7*(s/sp_mag_max), "periodogram"))
 
+    beats = None
     try:
         tempo_bt, beats = librosa.beat.beat_track(onset_envelope=oenv, sr=sr, hop_length=hop, units='time')
+        tempo_bt = float(np.atleast_1d(tempo_bt)[0])
         if np.isfinite(tempo_bt) and tempo_bt > 0:
-            candidates.append((fold(float(tempo_bt)), 1.05, "beat_track"))
+            candidates.append((fold(tempo_bt), 1.05, "beat_track"))
         if beats is not None and len(beats) >= 2:
             ibi = np.diff(beats)
             ibi = ibi[ibi > 0]
@@ -888,7 +1814,7 @@ def _tempo_detail(y, sr, hop=256, band=(70.0, 180.0)):
         pass
 
     if not candidates:
-        return {"bpm": 0.0, "alt_half": 0.0, "alt_double": 0.0, "confidence": 0.0, "method": "none", "candidates": []}
+        return {"bpm": 0.0, "alt_half": 0.0, "alt_double": 0.0, "confidence": 0.0, "method": "none", "candidates": [], "beats": []}
 
     bins = {}
     for bpm_f, w, src in candidates:
@@ -920,18 +1846,377 @@ def _tempo_detail(y, sr, hop=256, band=(70.0, 180.0)):
         "alt_double": float(round(alt_double, 2)),
         "confidence": confidence,
         "method": method,
-        "candidates": uniq
+        "candidates": uniq,
+        "beats": [] if beats is None else [float(t) for t in beats]
     }
 
-# ─── API: BPM-only analyzer (single route; never 500) ────────────────────
+def _analyze_snippet(y, sr, offset=0.0, hop=256, band=(70.0, 180.0), default_bpm=120.0):
+    """
+    Tempo + key + beat grid + loudness for a decoded snippet, from one shared
+    feature bundle (one STFT, one HPSS). Beat times are in file time.
+    """
+    feats = _Feats(y, sr, hop=hop)
+    detail = _tempo_detail(y, sr, hop=hop, band=band, feats=feats)
+    bpm = detail.get("bpm", 0.0)
+    if not np.isfinite(bpm) or bpm <= 0:
+        bpm = float(_tempo(y, sr, feats=feats))
+        if not np.isfinite(bpm) or bpm <= 0:
+            bpm = default_bpm
+        confidence = 0.25
+        alt_bpms = []
+    else:
+        confidence = float(detail.get("confidence", 0.0))
+        alt_bpms = []
+        if detail.get("alt_half"):
+            half = float(detail["alt_half"])
+            if abs(half - bpm) > 1.0:
+                alt_bpms.append(round(half, 2))
+        if detail.get("alt_double"):
+            doub = float(detail["alt_double"])
+            if abs(doub - bpm) > 1.0:
+                alt_bpms.append(round(doub, 2))
+
+    try:
+        key_name, _, _ = _key(y, sr, feats=feats)
+    except Exception as e:
+        print("[analyze] key failed:", e)
+        key_name = "Unknown"
+
+    y = np.asarray(y, dtype=np.float32)
+    return {
+        "bpm": round(float(bpm), 2),
+        "confidence": confidence,
+        "alt_bpms": alt_bpms,
+        "key": key_name,
+        "beats": [round(float(t) + offset, 3) for t in detail.get("beats", [])],
+        "loudness_db": round(20.0 * float(np.log10(_rms(y))), 2),
+        "peak_db": round(20.0 * float(np.log10(np.max(np.abs(y)) + 1e-12)), 2)
+    }
+
+# ─── Analysis result cache (content-prefix hash → JSON, SQLite, LRU) ─────
+import sqlite3
+
+ANALYZE_CACHE_DB    = os.environ.get('SLITOEX_ANALYZE_CACHE', os.path.join(exe_dir, 'slitoex', 'analyze_cache.sqlite3'))
+ANALYZE_CACHE_BYTES = int(os.environ.get('SLITOEX_ANALYZE_CACHE_BYTES', str(32 * 1024 * 1024)))
+ANALYZE_VERSION     = 2  # bump when the analyzer's output changes
+
+def _file_digest(stream, chunk=1 << 20):
+    """sha256 of an upload stream; rewinds it so it can still be saved/decoded."""
+    h = hashlib.sha256()
+    stream.seek(0)
+    while True:
+        b = stream.read(chunk)
+        if not b:
+            break
+        h.update(b)
+    stream.seek(0)
+    return h.hexdigest()
+
+# Analysis results are keyed by the first ANALYZE_KEY_BYTES of the file rather than all
+# of it: the analyzed window (30 s from 0.2 s) lies inside that prefix for compressed
+# audio and for PCM up to 48 kHz/24-bit or 96 kHz/16-bit stereo, so equal prefixes give
+# equal results, and /api/analyze can answer a hit once the prefix has arrived, before
+# the rest of the upload and without a decode. /api/analyze and /api/analyze_batch
+# share the scheme, so they share entries. Files shorter than the prefix hash exactly
+# as they did under the earlier whole-file key; entries for longer ones age out.
+ANALYZE_KEY_BYTES = int(os.environ.get('SLITOEX_ANALYZE_KEY_BYTES', str(16 * 1024 * 1024)))
+
+def _analysis_digest(stream, limit=None):
+    """sha256 of the first `limit` (ANALYZE_KEY_BYTES) bytes of a file; rewinds it."""
+    left = ANALYZE_KEY_BYTES if limit is None else limit
+    h = hashlib.sha256()
+    stream.seek(0)
+    while left > 0:
+        b = stream.read(min(left, 1 << 20))
+        if not b:
+            break
+        h.update(b)
+        left -= len(b)
+    stream.seek(0)
+    return h.hexdigest()
+
+def _analyze_cache_key(digest, offset, duration, hop, band):
+    return f"v{ANALYZE_VERSION}:{digest}:{offset:g}:{duration:g}:{hop}:{band[0]:g}-{band[1]:g}"
+
+def _acache_conn():
+    os.makedirs(os.path.dirname(ANALYZE_CACHE_DB), exist_ok=True)
+    con = sqlite3.connect(ANALYZE_CACHE_DB, timeout=5.0)
+    con.execute("CREATE TABLE IF NOT EXISTS analyze_cache ("
+                " key TEXT PRIMARY KEY, payload TEXT NOT NULL,"
+                " size INTEGER NOT NULL, last_used REAL NOT NULL)")
+    con.execute("CREATE INDEX IF NOT EXISTS analyze_cache_lru ON analyze_cache(last_used)")
+    return con
+
+def _acache_get(key):
+    try:
+        con = _acache_conn()
+        try:
+            with con:
+                row = con.execute("SELECT payload FROM analyze_cache WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                con.execute("UPDATE analyze_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            return json.loads(row[0])
+        finally:
+            con.close()
+    except Exception as e:
+        print("[analyze cache] get failed:", e)
+        return None
+
+def _acache_put(key, payload):
+    try:
+        blob = json.dumps(payload)
+        con = _acache_conn()
+        try:
+            with con:
+                con.execute("INSERT OR REPLACE INTO analyze_cache(key, payload, size, last_used) VALUES (?,?,?,?)",
+                            (key, blob, len(blob), time.time()))
+                total = con.execute("SELECT COALESCE(SUM(size), 0) FROM analyze_cache").fetchone()[0]
+                if total > ANALYZE_CACHE_BYTES:
+                    # Evict least recently used rows until back under the cap.
+                    drop = []
+                    for k, size in con.execute("SELECT key, size FROM analyze_cache ORDER BY last_used ASC"):
+                        if total <= ANALYZE_CACHE_BYTES:
+                            break
+                        drop.append((k,))
+                        total -= size
+                    con.executemany("DELETE FROM analyze_cache WHERE key = ?", drop)
+        finally:
+            con.close()
+    except Exception as e:
+        print("[analyze cache] put failed:", e)
+
+def _analyze_samples(y, sr, offset=0.2, hop=256, band=(70.0, 180.0), default_bpm=120.0):
+    """Analyze a decoded snippet. Silent/unreadable audio gets a 'note'."""
+    if y is None or len(y) < 4096 or float(np.max(np.abs(y)) + 1e-12) < 1e-4:
+        return {
+            "bpm": default_bpm,
+            "confidence": 0.0,
+            "alt_bpms": [],
+            "key": "Unknown",
+            "note": "silent or unreadable audio"
+        }
+    return _analyze_snippet(y, sr, offset=offset, hop=hop, band=band, default_bpm=default_bpm)
+
+def _analyze_path(path, offset=0.2, duration=30.0, hop=256, band=(70.0, 180.0), default_bpm=120.0):
+    """Decode a snippet of `path` and analyze it."""
+    y, sr = _load_snippet(path, sr=44100, offset=offset, duration=duration)
+    return _analyze_samples(y, sr, offset=offset, hop=hop, band=band, default_bpm=default_bpm)
+
+# ─── Streaming ingest (decode the upload while it arrives) ───────────────
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, File, Data, Epilogue, NEED_DATA
+
+INGEST_CHUNK = 64 * 1024
+INGEST_FIRST_PROBE = int(os.environ.get("SLITOEX_INGEST_FIRST_PROBE", str(512 * 1024)))
+INGEST_PROBE_GROWTH = 1.5
+
+def _request_upload(field="file", chunk=INGEST_CHUNK):
+    """
+    (filename, chunk iterator) for one upload, read straight off the request socket.
+    multipart/form-data is parsed incrementally, so nothing is spooled by the form
+    parser; any other body is taken as the raw file (named by ?filename=).
+    Returns (None, None) when the field isn't there.
+    """
+    stream = request.stream
+    mimetype, opts = parse_options_header(request.headers.get("Content-Type", ""))
+    if mimetype != "multipart/form-data":
+        if not request.content_length and not request.headers.get("Transfer-Encoding"):
+            return None, None
+        def raw():
+            while True:
+                b = stream.read(chunk)
+                if not b:
+                    return
+                yield b
+        return request.args.get("filename") or "audio", raw()
+
+    boundary = opts.get("boundary", "")
+    if not boundary:
+        return None, None
+    dec = MultipartDecoder(boundary.encode("latin-1"))
+
+    def events():
+        eof = False
+        while True:
+            ev = dec.next_event()
+            if ev is NEED_DATA:
+                if eof:
+                    return
+                b = stream.read(chunk)
+                eof = not b
+                dec.receive_data(b or None)
+            elif isinstance(ev, Epilogue):
+                return
+            else:
+                yield ev
+
+    evs = events()
+    for ev in evs:
+        if isinstance(ev, File) and ev.name == field:
+            break
+    else:
+        return None, None
+
+    def data():
+        for d in evs:
+            if not isinstance(d, Data):
+                return
+            if d.data:
+                yield d.data
+            if not d.more_data:
+                return
+    return ev.filename, data()
+
+class _PipeDecoder:
+    """
+    One ffmpeg process decoding the analysis window from bytes fed to its stdin.
+    A reader thread collects the f32le output and flags `done` once the window's
+    sample count is in; feed() then reports False and the caller stops writing.
+    """
+    def __init__(self, sr, offset, duration):
+        self.n = int(round(duration * sr))
+        self.y = np.zeros(0, dtype=np.float32)
+        self.done = threading.Event()
+        cmd = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-i", "pipe:0", "-ss", str(offset), "-t", str(duration),
+            "-ac", "1", "-ar", str(sr), "-f", "f32le", "pipe:1"
+        ]
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL)
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def _read(self):
+        try:
+            self.y = _read_pcm_f32(self.proc.stdout, self.n)
+            self.done.set()
+            # Keep draining so ffmpeg can't stall on a full pipe while it still reads stdin.
+            while self.proc.stdout.read(INGEST_CHUNK):
+                pass
+        except (OSError, ValueError):
+            self.done.set()
+
+    def feed(self, b):
+        """Write one chunk; False once the window is in or ffmpeg has stopped reading."""
+        if self.done.is_set():
+            return False
+        try:
+            self.proc.stdin.write(b)
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            return False
+        return not self.done.is_set()
+
+    def window(self):
+        """The full window once feeding has stopped, else None (ffmpeg gave up early)."""
+        self.reader.join(timeout=5.0)
+        return self.y if len(self.y) >= self.n else None
+
+    def finish(self):
+        """
+        At end of upload: the window, or None if it came up short. ffmpeg exits 0 with
+        no output for inputs it can't stream (MP4 with the index at the end), so short
+        files go back through _load_snippet on the spooled copy either way.
+        """
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        self.reader.join()
+        self.proc.wait()
+        return self.y if len(self.y) >= self.n else None
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        for f in (self.proc.stdin, self.proc.stdout):
+            try:
+                f.close()
+            except OSError:
+                pass
+        self.proc.wait()
+        self.reader.join(timeout=5.0)
+
+def _probe_window(path, sr, offset, duration):
+    """No-ffmpeg fallback: the full window from a partially written file, or None if it isn't there yet."""
+    n = int(round(duration * sr))
+    try:
+        y = _snippet_soundfile(path, sr, offset, duration)
+    except Exception:
+        return None
+    return y[:n] if len(y) >= n else None
+
+def _ingest_snippet(chunks, path, sr=44100, offset=0.2, duration=30.0, lookup=None):
+    """
+    Read upload `chunks` until both the analysis window has decoded and the cache key
+    prefix (ANALYZE_KEY_BYTES) has been hashed. `lookup(digest)` is asked as soon as
+    the key is known; a hit ends the read there, without waiting on the decode.
+    The window is decoded by a single ffmpeg fed through its stdin (_PipeDecoder);
+    bytes fed are also spooled to `path`, so if ffmpeg can't decode from a stream
+    (index at the end, ...) the rest is spooled and _load_snippet takes over. Without
+    ffmpeg the spooled prefix is probed with soundfile at geometrically spaced sizes.
+    Returns (y, sr, digest, hit, complete): y is None on a hit, complete is True when
+    the whole upload was read.
+    """
+    h, hashed, digest = hashlib.sha256(), 0, None
+    y, decoding, spooled, next_probe = None, True, 0, INGEST_FIRST_PROBE
+    dec = _PipeDecoder(sr, offset, duration) if shutil.which("ffmpeg") else None
+    try:
+        with open(path, "wb") as out:
+            for b in chunks:
+                if digest is None:
+                    part = b[:ANALYZE_KEY_BYTES - hashed]
+                    h.update(part)
+                    hashed += len(part)
+                    if hashed >= ANALYZE_KEY_BYTES:
+                        digest = h.hexdigest()
+                        hit = lookup(digest) if lookup else None
+                        if hit is not None:
+                            return None, sr, digest, hit, False
+                if y is None:
+                    out.write(b)
+                    spooled += len(b)
+                    if dec is None:
+                        if spooled >= next_probe:
+                            out.flush()
+                            next_probe = int(spooled * INGEST_PROBE_GROWTH)
+                            y = _probe_window(path, sr, offset, duration)
+                    elif decoding and not dec.feed(b):
+                        decoding = False
+                        y = dec.window()
+                if y is not None and digest is not None:
+                    return y, sr, digest, None, False
+
+        if digest is None:
+            digest = h.hexdigest()
+            hit = lookup(digest) if lookup else None
+            if hit is not None:
+                return None, sr, digest, hit, True
+        if y is None and dec is not None and decoding:
+            y = dec.finish()
+        if y is None:
+            y, sr = _load_snippet(path, sr=sr, offset=offset, duration=duration)
+        return y, sr, digest, None, True
+    finally:
+        if dec is not None:
+            dec.close()
+
+# ─── API: tempo/key analyzer (single route; never 500) ───────────────────
 @app.post("/api/analyze")
 def api_analyze():
+    """
+    Tempo/key of an upload's first 30 s. The request body is decoded as it streams
+    in and dropped once the window (and the cache key prefix) is covered, so time and
+    disk use don't grow with file size.
+    """
     import traceback
     DEFAULT_BPM = 120.0
 
     try:
-        f = request.files.get("file")
-        if not f or not f.filename:
+        name, chunks = _request_upload("file")
+        if not name:
             return jsonify({
                 "bpm": DEFAULT_BPM,
                 "confidence": 0.0,
@@ -940,46 +2225,26 @@ def api_analyze():
                 "note": "no file"
             }), 200
 
+        offset, duration, hop, band = 0.2, 30.0, 256, (70.0, 180.0)
+        key = lambda digest: _analyze_cache_key(digest, offset, duration, hop, band)
         with TemporaryDirectory() as td:
-            path = os.path.join(td, secure_filename(f.filename or "audio"))
-            f.save(path)
-            y, sr = _load_snippet(path, sr=44100, offset=0.2, duration=30.0)
-
-        if y is None or len(y) < 4096 or float(np.max(np.abs(y)) + 1e-12) < 1e-4:
-            return jsonify({
-                "bpm": DEFAULT_BPM,
-                "confidence": 0.0,
-                "alt_bpms": [],
-                "key": "Unknown",
-                "note": "silent or unreadable audio"
-            }), 200
-
-        detail = _tempo_detail(y, sr, hop=256, band=(70.0, 180.0))
-        bpm = detail.get("bpm", 0.0)
-        if not np.isfinite(bpm) or bpm <= 0:
-            bpm = float(_tempo(y, sr))
-            if not np.isfinite(bpm) or bpm <= 0:
-                bpm = DEFAULT_BPM
-            confidence = 0.25
-            alt_bpms = []
+            path = os.path.join(td, secure_filename(name) or "audio")
+            y, sr, digest, result, complete = _ingest_snippet(chunks, path, sr=44100, offset=offset,
+                                                              duration=duration,
+                                                              lookup=lambda d: _acache_get(key(d)))
+        if result is not None:
+            result["cached"] = True
         else:
-            confidence = float(detail.get("confidence", 0.0))
-            alt_bpms = []
-            if detail.get("alt_half"):
-                half = float(detail["alt_half"])
-                if abs(half - bpm) > 1.0:
-                    alt_bpms.append(round(half, 2))
-            if detail.get("alt_double"):
-                doub = float(detail["alt_double"])
-                if abs(doub - bpm) > 1.0:
-                    alt_bpms.append(round(doub, 2))
+            result = dsp_call(_analyze_samples, y, sr, offset=offset, hop=hop, band=band,
+                              default_bpm=DEFAULT_BPM, timeout=DSP_TIMEOUT_SHORT)
+            if "note" not in result:
+                _acache_put(key(digest), result)
 
-        return jsonify({
-            "bpm": round(float(bpm), 2),
-            "confidence": confidence,
-            "alt_bpms": alt_bpms,
-            "key": "Unknown"
-        }), 200
+        resp = jsonify(result)
+        if not complete:
+            # The unread remainder is still on the socket; don't reuse the connection.
+            resp.headers["Connection"] = "close"
+        return resp, 200
 
     except Exception as e:
         print("[/api/analyze] FATAL:", e)
@@ -992,6 +2257,657 @@ def api_analyze():
             "note": f"degraded: {type(e).__name__}"
         }), 200
 
+# ─── Warm DSP worker pool (analysis / render / image work) ──────────────
+import signal
+from concurrent.futures import Future, wait
+
+DSP_WORKERS       = int(os.environ.get('SLITOEX_DSP_WORKERS',
+                                       os.environ.get('SLITOEX_ANALYZE_WORKERS', str(os.cpu_count() or 1))))
+DSP_TIMEOUT       = float(os.environ.get('SLITOEX_DSP_TIMEOUT', '900'))        # renders
+DSP_TIMEOUT_SHORT = float(os.environ.get('SLITOEX_DSP_TIMEOUT_SHORT', '120'))  # analysis, images
+DSP_GRACE_S       = 30.0   # past the in-worker timeout before the pool itself is torn down
+DSP_WARM_WORKERS  = os.environ.get('SLITOEX_WARMUP_WORKERS', '0') == '1'  # _dsp_warm in every worker at start
+
+_dsp_executor = None
+_dsp_lock = threading.Lock()
+
+def _pool_context():
+    # Workers start lazily, often while request threads are inside libsndfile/numba;
+    # forking then can inherit a held lock. forkserver children start from a clean process.
+    import multiprocessing
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return None
+
+_dsp_warm_futs = []
+_dsp_warm_info = {}   # per worker process: what _dsp_warm did
+
+def _dsp_warm():
+    """
+    Run the analysis and render paths once on a few seconds of synthetic audio, so
+    numba kernels compile (or load from NUMBA_CACHE_DIR), FFT plans exist and the
+    madmom models are loaded before the first real request.
+    """
+    t0 = time.perf_counter()
+    sr = 44100
+    rng = np.random.default_rng(0)
+    t = np.arange(6 * sr) / sr
+    env = np.exp(-np.arange(4000) / 600.0)
+
+    def track(bpm, f0):
+        y = 0.15 * np.sin(2 * np.pi * f0 * t)
+        for n in (np.arange(0.0, 6.0, 60.0 / bpm) * sr).astype(int):
+            k = min(len(env), len(y) - n)
+            y[n:n + k] += 0.6 * rng.standard_normal(k) * env[:k]
+        return y.astype(np.float32)
+
+    if HAVE_MADMOM:
+        _madmom_processors(MADMOM_FAST)
+    inst, voc = track(120.0, 261.63), track(100.0, 293.66)
+    _analyze_samples(inst, sr)
+    with TemporaryDirectory(prefix="slitoex-warm-") as td:
+        i_path, v_path = os.path.join(td, "i.wav"), os.path.join(td, "v.wav")
+        sf.write(i_path, inst, sr)
+        sf.write(v_path, voc, sr)
+        make_remix(v_path, i_path, os.path.join(td, "o.wav"))
+    return {"seconds": round(time.perf_counter() - t0, 2), "madmom": bool(HAVE_MADMOM)}
+
+def _dsp_init():
+    # Pool worker start-up. Importing this module already loaded numpy/scipy/librosa;
+    # librosa's submodules load lazily, so pull them in, and load the madmom RNNs (per
+    # process, not cached on disk). The full _dsp_warm only runs here with
+    # SLITOEX_WARMUP_WORKERS=1; otherwise the boot warmup runs it on one worker and the
+    # others load the compiled kernels from NUMBA_CACHE_DIR on first use.
+    import librosa.beat, librosa.onset, librosa.feature, librosa.effects  # noqa: F401
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if HAVE_MADMOM:
+        try:
+            _madmom_processors(MADMOM_FAST)
+            _dsp_warm_info["madmom"] = True
+        except Exception as e:
+            print("[DSP] madmom preload failed:", e)
+            _dsp_warm_info["error"] = f"{type(e).__name__}: {e}"
+    if not DSP_WARM_WORKERS:
+        return
+    try:
+        _dsp_warm_info.update(_dsp_warm())
+    except Exception as e:
+        print("[DSP] worker warmup failed:", e)
+        _dsp_warm_info["error"] = f"{type(e).__name__}: {e}"
+
+def _dsp_worker_info():
+    return {"pid": os.getpid(), **_dsp_warm_info}
+
+def _dsp_alarm(signum, frame):
+    raise TimeoutError("DSP task timed out")
+
+def _dsp_task(fn, args, kw, timeout, progress_file):
+    # Runs in a pool worker (main thread); must stay top-level so it pickles.
+    # The timer re-fires every second so code that swallows the first one still stops.
+    timer = bool(timeout) and hasattr(signal, 'setitimer')
+    fh = open(progress_file, 'a', encoding='utf-8') if progress_file else None
+    if fh is not None:
+        def report(stage, frac):
+            fh.write(f"{stage}\t{float(frac):.4f}\n")
+            fh.flush()
+        kw = dict(kw, progress=report)
+    if timer:
+        signal.signal(signal.SIGALRM, _dsp_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout, 1.0)
+    try:
+        return fn(*args, **kw)
+    finally:
+        if timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if fh is not None:
+            fh.close()
+
+def _dsp_pool():
+    """
+    The shared pool, built by the boot warmup or else by the first dsp_submit, with
+    all workers started right away.
+    """
+    global _dsp_executor
+    with _dsp_lock:
+        if _dsp_executor is None:
+            n = max(1, DSP_WORKERS)
+            _dsp_executor = ProcessPoolExecutor(max_workers=n, mp_context=_pool_context(),
+                                                initializer=_dsp_init)
+            # Workers spawn on demand: one submit each pre-forks them all.
+            _dsp_warm_futs[:] = [_dsp_executor.submit(_dsp_worker_info) for _ in range(n)]
+        return _dsp_executor
+
+def _dsp_reset(kill=False):
+    """Drop the pool (next use builds a fresh one). kill: terminate its workers too."""
+    global _dsp_executor
+    with _dsp_lock:
+        ex, _dsp_executor = _dsp_executor, None
+    if ex is None:
+        return
+    if kill:
+        for proc in list((getattr(ex, '_processes', None) or {}).values()):
+            proc.terminate()
+    ex.shutdown(wait=False, cancel_futures=True)
+
+def dsp_submit(fn, *args, timeout=None, _progress_file=None, **kw):
+    """
+    Queue fn(*args, **kw) on a warm DSP worker; returns a Future. fn must be a
+    top-level function and its arguments/result picklable. The worker raises
+    TimeoutError after `timeout` s (default DSP_TIMEOUT). SLITOEX_DSP_WORKERS=0
+    runs inline instead (no timeout).
+    """
+    timeout = DSP_TIMEOUT if timeout is None else timeout
+    if DSP_WORKERS <= 0:
+        fut = Future()
+        try:
+            fut.set_result(fn(*args, **kw))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+    try:
+        return _dsp_pool().submit(_dsp_task, fn, args, kw, timeout, _progress_file)
+    except BrokenProcessPool:
+        print("[DSP] worker pool died, restarting")
+        _dsp_reset()
+        return _dsp_pool().submit(_dsp_task, fn, args, kw, timeout, _progress_file)
+
+def _relay_progress(path, pos, progress):
+    """Forward new 'stage\tfrac' lines a worker appended to `path`; returns the new offset."""
+    try:
+        with open(path, 'rb') as fh:
+            fh.seek(pos)
+            chunk = fh.read()
+    except FileNotFoundError:
+        return pos
+    lines = chunk.split(b"\n")
+    for ln in lines[:-1]:
+        stage, frac = ln.decode('utf-8').split("\t")
+        progress(stage, float(frac))
+    return pos + len(chunk) - len(lines[-1])
+
+def dsp_call(fn, *args, timeout=None, progress=None, **kw):
+    """
+    Run fn(*args, **kw) on a warm DSP worker and return its result; worker
+    exceptions re-raise here. progress(stage, frac), if given, is passed on to fn
+    as `progress` and relayed back from the worker. A worker that overruns its
+    timeout by DSP_GRACE_S (stuck in native code) takes the pool down with it.
+    """
+    timeout = DSP_TIMEOUT if timeout is None else timeout
+    if DSP_WORKERS <= 0:
+        return fn(*args, **kw, **({'progress': progress} if progress else {}))
+    with TemporaryDirectory(prefix="slitoex-dsp-") as td:
+        pfile = os.path.join(td, "progress") if progress else None
+        fut = dsp_submit(fn, *args, timeout=timeout, _progress_file=pfile, **kw)
+        deadline = time.monotonic() + timeout + DSP_GRACE_S
+        pos = 0
+        while True:
+            done, _ = wait([fut], timeout=0.25 if progress else max(0.0, deadline - time.monotonic()))
+            if progress:
+                pos = _relay_progress(pfile, pos, progress)
+            if done:
+                try:
+                    return fut.result()
+                except BrokenProcessPool:
+                    _dsp_reset()
+                    raise
+            if time.monotonic() >= deadline:
+                print(f"[DSP] {getattr(fn, '__name__', fn)} ignored its {timeout:g}s timeout; restarting pool")
+                _dsp_reset(kill=True)
+                raise TimeoutError(f"DSP task timed out after {timeout:g}s")
+
+# ─── API: batch analyzer (process pool, NDJSON stream) ───────────────────
+import zipfile
+import tempfile
+
+BATCH_MAX_FILES   = int(os.environ.get('SLITOEX_BATCH_MAX_FILES', '500'))
+BATCH_MAX_BYTES   = int(os.environ.get('SLITOEX_BATCH_MAX_BYTES', str(2 * 1024**3)))  # unpacked total
+AUDIO_EXTS        = ('.wav', '.mp3', '.flac', '.ogg', '.m4a', '.aac', '.aif', '.aiff', '.opus', '.webm')
+
+def _analyze_job(path, offset, duration, hop, band):
+    # Runs in a pool worker; must stay a top-level function so it pickles.
+    try:
+        return _analyze_path(path, offset=offset, duration=duration, hop=hop, band=band)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+class BatchTooLarge(Exception):
+    pass
+
+def _copy_capped(src, out, budget, chunk=1 << 20):
+    """Copy src → out, raising BatchTooLarge once more than `budget` bytes came through."""
+    n = 0
+    while True:
+        b = src.read(chunk)
+        if not b:
+            return n
+        n += len(b)
+        if n > budget:
+            raise BatchTooLarge(f"batch unpacks to more than {BATCH_MAX_BYTES} bytes")
+        out.write(b)
+
+def _stage_batch_uploads(files, td):
+    """
+    Save uploads (and members of any .zip) into td. Returns [(display_name, path)].
+    Raises BatchTooLarge past BATCH_MAX_BYTES in total: zip members are checked by
+    their declared size first and counted while they inflate (headers can lie).
+    """
+    staged = []
+    budget = BATCH_MAX_BYTES
+    for n, f in enumerate(files):
+        name = f.filename or f"track_{n}"
+        if name.lower().endswith('.zip'):
+            with zipfile.ZipFile(f.stream) as zf:
+                for m, info in enumerate(zf.infolist()):
+                    if info.is_dir() or not info.filename.lower().endswith(AUDIO_EXTS):
+                        continue
+                    if info.file_size > budget:
+                        raise BatchTooLarge(f"batch unpacks to more than {BATCH_MAX_BYTES} bytes")
+                    dest = os.path.join(td, f"{n}_{m}_{secure_filename(os.path.basename(info.filename)) or 'audio'}")
+                    with zf.open(info) as src, open(dest, 'wb') as out:
+                        budget -= _copy_capped(src, out, budget)
+                    staged.append((info.filename, dest))
+                    if len(staged) > BATCH_MAX_FILES:
+                        break
+        else:
+            dest = os.path.join(td, f"{n}_{secure_filename(name) or 'audio'}")
+            with open(dest, 'wb') as out:
+                budget -= _copy_capped(f.stream, out, budget)
+            staged.append((name, dest))
+        if len(staged) > BATCH_MAX_FILES:
+            break
+    return staged[:BATCH_MAX_FILES]
+
+@app.post("/api/analyze_batch")
+def api_analyze_batch():
+    """
+    Form: files=<audio or .zip> (repeatable)
+    Streams NDJSON: one {"file", "index", ...analysis} line per finished track,
+    in completion order, then a final {"done": true, "count": n}.
+    """
+    files = [f for f in request.files.getlist("files") + request.files.getlist("file") if f and f.filename]
+    if not files:
+        return jsonify({"ok": False, "error": "no files"}), 400
+
+    offset, duration, hop, band = 0.2, 30.0, 256, (70.0, 180.0)
+    td = tempfile.mkdtemp(prefix="slitoex_batch_")
+    try:
+        staged = _stage_batch_uploads(files, td)
+    except zipfile.BadZipFile:
+        shutil.rmtree(td, ignore_errors=True)
+        return jsonify({"ok": False, "error": "bad zip file"}), 400
+    except BatchTooLarge as e:
+        shutil.rmtree(td, ignore_errors=True)
+        return jsonify({"ok": False, "error": str(e)}), 413
+
+    def line(obj):
+        return json.dumps(obj) + "\n"
+
+    def generate():
+        try:
+            pending = {}
+            for idx, (name, path) in enumerate(staged):
+                with open(path, 'rb') as fh:
+                    key = _analyze_cache_key(_analysis_digest(fh), offset, duration, hop, band)
+                hit = _acache_get(key)
+                if hit is not None:
+                    yield line({"file": name, "index": idx, "cached": True, **hit})
+                    continue
+                fut = dsp_submit(_analyze_job, path, offset, duration, hop, band, timeout=DSP_TIMEOUT_SHORT)
+                pending[fut] = (idx, name, key)
+            for fut in as_completed(pending):
+                idx, name, key = pending[fut]
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    res = {"error": f"{type(e).__name__}: {e}"}
+                if "error" not in res and "note" not in res:
+                    _acache_put(key, res)
+                yield line({"file": name, "index": idx, **res})
+            yield line({"done": True, "count": len(staged)})
+        finally:
+            shutil.rmtree(td, ignore_errors=True)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# ─── API: batch remix (one instrumental, many vocals) ───────────────────
+import pickle
+from concurrent.futures import FIRST_COMPLETED
+
+_batch_inst = {}   # per worker process: analysis file → loaded analysis (latest batch only)
+
+def _remix_batch_prepare(inst_path, work_dir, sr=None):
+    # Pool worker: analyze the instrumental once and pickle the result for the render jobs.
+    inst = analyze_instrumental(inst_path, sr=sr)
+    if inst["samples"] is not None:
+        # Not streamable at the render rate: store a render-rate copy so workers can stream it.
+        path = os.path.join(work_dir, "instrumental_render.wav")
+        sf.write(path, inst["samples"], inst["sr"], subtype="FLOAT")
+        inst["path"], inst["samples"] = path, None
+    out = os.path.join(work_dir, "instrumental.pkl")
+    with open(out, "wb") as f:
+        pickle.dump(inst, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return out, {"bpm": float(inst["bpm"]), "key": inst["key"], "sr": inst["sr"], "analysis_sr": inst["asr"]}
+
+def _remix_batch_job(inst_file, vocal_path, out_path):
+    # Pool worker: render one vocal against the shared instrumental analysis.
+    try:
+        inst = _batch_inst.get(inst_file)
+        if inst is None:
+            with open(inst_file, "rb") as f:
+                inst = pickle.load(f)
+            _batch_inst.clear()
+            _batch_inst[inst_file] = inst
+        return render_vocal(vocal_path, inst, out_path)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+@app.post("/api/remix_batch")
+def api_remix_batch():
+    """
+    Form: instrumental=<audio> (split once; its instrumental is reused),
+          vocals=<audio or .zip> (repeatable; each is split for its vocal stem),
+          mode=2stem|4stem, inst_is_stem=1 / vocals_are_stems=1 to skip separation.
+    Streams NDJSON: {"instrumental": {...}} first, then one {"file", "index", "preview", "meta"}
+    line per finished remix (completion order), then {"done": true, "count": n}.
+    """
+    inst_f = request.files.get("instrumental") or request.files.get("songB")
+    files = [f for f in request.files.getlist("vocals") if f and f.filename]
+    if not inst_f or not files:
+        return jsonify({"ok": False, "error": "instrumental and vocals required"}), 400
+    mode = request.form.get("mode", "2stem")
+    flag = lambda k: str(request.form.get(k, "")).lower() in ("1", "true", "yes")
+    inst_is_stem, vocals_are_stems = flag("inst_is_stem"), flag("vocals_are_stems")
+    base = request.host_url.rstrip("/")
+
+    td = tempfile.mkdtemp(prefix="slitoex_rbatch_")
+    inst_in = os.path.join(td, "inst_" + secure_filename(inst_f.filename or "inst.wav"))
+    inst_f.save(inst_in)
+    try:
+        staged = _stage_batch_uploads(files, td)
+    except zipfile.BadZipFile:
+        shutil.rmtree(td, ignore_errors=True)
+        return jsonify({"ok": False, "error": "bad zip file"}), 400
+    except BatchTooLarge as e:
+        shutil.rmtree(td, ignore_errors=True)
+        return jsonify({"ok": False, "error": str(e)}), 413
+
+    def line(obj):
+        return json.dumps(obj) + "\n"
+
+    def vocal_stem(path, pins, pins_lock):
+        if vocals_are_stems:
+            return path
+        d, _ = separate_cached(path, mode=mode)
+        with pins_lock:   # pinned before its files are looked up, see _stem_drop_stale
+            pins.enter_context(stem_pins(d))
+        v = pick_vocals_stem(Path(d))
+        if not v:
+            raise RuntimeError("no vocal stem found")
+        return v
+
+    def generate():
+        splitter = ThreadPoolExecutor(max_workers=max(1, DEMUCS_WORKERS), thread_name_prefix="slitoex-rbatch")
+        pins = ExitStack()   # stem cache entries the renders read from, held until the batch ends
+        pins_lock = threading.Lock()
+        try:
+            # Vocal separations start right away; the instrumental is split and analyzed meanwhile.
+            splits = {splitter.submit(vocal_stem, path, pins, pins_lock): (idx, name)
+                      for idx, (name, path) in enumerate(staged)}
+            try:
+                if inst_is_stem:
+                    b_inst = inst_in
+                else:
+                    b_dir, _ = separate_cached(inst_in, mode=mode)
+                    with pins_lock:
+                        pins.enter_context(stem_pins(b_dir))
+                    b_inst = _instrumental_from_stems(Path(b_dir), mode, td)
+                if not b_inst:
+                    raise RuntimeError("could not find instrumental stem")
+                inst_file, summary = dsp_call(_remix_batch_prepare, b_inst, td)
+            except Exception as e:
+                yield line({"ok": False, "error": f"instrumental: {e}"})
+                return
+            yield line({"instrumental": summary})
+
+            pending = set(splits)
+            renders = {}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    if fut in splits:
+                        idx, name = splits[fut]
+                        try:
+                            v_path = fut.result()
+                        except Exception as e:
+                            yield line({"file": name, "index": idx, "ok": False, "error": f"split: {e}"})
+                            continue
+                        out_name = f"remix_{uuid.uuid4().hex[:8]}.wav"
+                        rf = dsp_submit(_remix_batch_job, inst_file, v_path,
+                                        os.path.join(OUTPUT_FOLDER, out_name))
+                        renders[rf] = (idx, name, out_name)
+                        pending.add(rf)
+                    else:
+                        idx, name, out_name = renders[fut]
+                        try:
+                            meta = fut.result()
+                        except Exception as e:
+                            meta = {"error": f"{type(e).__name__}: {e}"}
+                        if "error" in meta:
+                            yield line({"file": name, "index": idx, "ok": False, "error": meta["error"]})
+                        else:
+                            yield line({"file": name, "index": idx, "ok": True,
+                                        "preview": f"{base}/share/{out_name}", "meta": meta})
+            yield line({"done": True, "count": len(staged)})
+        finally:
+            # Separations not started yet are dropped; running ones still read from td
+            # and may pin entries, so wait for them before unpinning and removing td.
+            splitter.shutdown(wait=True, cancel_futures=True)
+            pins.close()
+            shutil.rmtree(td, ignore_errors=True)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# ─── Background jobs (split / remix) ─────────────────────────────────────
+from werkzeug.datastructures import FileStorage
+
+JOB_WORKERS   = int(os.environ.get('SLITOEX_JOB_WORKERS', '2'))
+JOB_QUEUE_MAX = int(os.environ.get('SLITOEX_JOB_QUEUE_MAX', '16'))
+JOB_TTL_S     = float(os.environ.get('SLITOEX_JOB_TTL', '3600'))
+JOBS_DB       = os.environ.get('SLITOEX_JOBS_DB', ANALYZE_CACHE_DB)
+
+# Job state lives in SQLite so every server process can answer status/events for any
+# job; the job itself runs on the pool of the process that accepted it.
+_JOB_FIELDS = ("id", "kind", "state", "stage", "progress", "result", "error", "created", "updated")
+_job_executor = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix="slitoex-job")
+
+def _jobs_conn():
+    os.makedirs(os.path.dirname(JOBS_DB), exist_ok=True)
+    con = sqlite3.connect(JOBS_DB, timeout=10.0, isolation_level=None)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, state TEXT NOT NULL, stage TEXT,"
+                " progress REAL NOT NULL DEFAULT 0, result TEXT, error TEXT,"
+                " created REAL NOT NULL, updated REAL NOT NULL, version INTEGER NOT NULL DEFAULT 0,"
+                " owner TEXT NOT NULL)")
+    con.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state)")
+    return con
+
+# Owner = host:pid:boot. The boot token tells this process apart from an earlier one
+# that had the same pid (a restarted container runs `python app.py` as pid 1 again).
+_JOB_BOOT = uuid.uuid4().hex[:12]
+# No stage runs longer than its timeout without a progress update, so a running job that
+# hasn't updated for JOB_STALE_S is dead whatever its owner looks like; queued ones may
+# wait behind a full pool of those first.
+JOB_STALE_S = max(DSP_TIMEOUT, DEMUCS_TIMEOUT) + DSP_GRACE_S
+
+def _job_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{_JOB_BOOT}"
+
+def _owner_alive(owner):
+    host, _, rest = owner.partition(":")
+    pid, _, boot = rest.partition(":")
+    if host != socket.gethostname():
+        return True   # can't tell from here
+    if pid == str(os.getpid()):
+        return boot == _JOB_BOOT
+    try:
+        os.kill(int(pid), 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except (OSError, ValueError):
+        return True
+
+def _job_dead(owner, state, updated, now):
+    """Why an unfinished job will never finish, or None if it may still be running."""
+    limit = JOB_STALE_S if state == 'running' else JOB_STALE_S * (JOB_QUEUE_MAX // max(1, JOB_WORKERS) + 1)
+    if now - updated > limit:
+        return "job stalled"
+    if not _owner_alive(owner):
+        return "server process restarted"
+    return None
+
+def _reap_jobs(con):
+    """Fail unfinished jobs whose process died or that went stale; drop finished ones past JOB_TTL_S."""
+    now = time.time()
+    rows = con.execute("SELECT id, owner, state, updated FROM jobs WHERE state IN ('queued', 'running')")
+    for jid, owner, state, updated in rows.fetchall():
+        why = _job_dead(owner, state, updated, now)
+        if why:
+            con.execute("UPDATE jobs SET state = 'error', error = ?,"
+                        " updated = ?, version = version + 1 WHERE id = ?", (why, now, jid))
+    con.execute("DELETE FROM jobs WHERE state IN ('done', 'error') AND updated < ?", (now - JOB_TTL_S,))
+
+def _job_row(con, job_id):
+    row = con.execute(f"SELECT {', '.join(_JOB_FIELDS)}, version, owner FROM jobs WHERE id = ?",
+                      (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(zip(_JOB_FIELDS + ("version", "owner"), row))
+    job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+    return job
+
+def _job_public(job):
+    return {k: job[k] for k in _JOB_FIELDS}
+
+def _job_get(job_id):
+    con = _jobs_conn()
+    try:
+        job = _job_row(con, job_id)
+        if (job is not None and job["state"] in ("queued", "running")
+                and _job_dead(job["owner"], job["state"], job["updated"], time.time())):
+            _reap_jobs(con)
+            job = _job_row(con, job_id)
+        return job
+    finally:
+        con.close()
+
+def _job_update(job_id, **fields):
+    if "result" in fields:
+        fields["result"] = json.dumps(fields["result"])
+    fields["updated"] = time.time()
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    try:
+        con = _jobs_conn()
+        try:
+            con.execute(f"UPDATE jobs SET {cols}, version = version + 1 WHERE id = ?",
+                        (*fields.values(), job_id))
+        finally:
+            con.close()
+    except sqlite3.Error as e:
+        print("[jobs] update failed:", e)
+
+def submit_job(kind, fn):
+    """
+    Queue fn(progress) on the job pool. progress(stage, frac) updates the job.
+    Returns the job id, or None when JOB_QUEUE_MAX jobs are already queued/running
+    (across all server processes).
+    """
+    con = _jobs_conn()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            _reap_jobs(con)
+            active = con.execute("SELECT COUNT(*) FROM jobs WHERE state IN ('queued', 'running')").fetchone()[0]
+            if active >= JOB_QUEUE_MAX:
+                con.execute("COMMIT")
+                return None
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            con.execute("INSERT INTO jobs(id, kind, state, stage, progress, created, updated, owner)"
+                        " VALUES (?, ?, 'queued', 'queued', 0, ?, ?, ?)", (job_id, kind, now, now, _job_owner()))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+    def progress(stage, frac):
+        _job_update(job_id, stage=stage, progress=round(float(np.clip(frac, 0.0, 1.0)), 3))
+
+    def run():
+        _job_update(job_id, state="running", stage="start")
+        try:
+            result = fn(progress)
+            _job_update(job_id, state="done", stage="done", progress=1.0, result=result)
+        except Exception as e:
+            import traceback; traceback.print_exc()
+            _job_update(job_id, state="error", error=str(e))
+
+    _job_executor.submit(run)
+    return job_id
+
+def _submit_job_response(kind, fn, cleanup_dir=None):
+    job_id = submit_job(kind, fn)
+    if job_id is None:
+        if cleanup_dir:
+            shutil.rmtree(cleanup_dir, ignore_errors=True)
+        return jsonify({"ok": False, "error": "server busy, try again shortly"}), 503
+    base = request.host_url.rstrip("/")
+    return jsonify({"ok": True, "job_id": job_id,
+                    "status_url": f"{base}/api/jobs/{job_id}",
+                    "events_url": f"{base}/api/jobs/{job_id}/events"}), 202
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    job = _job_get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "error": "unknown job"}), 404
+    return jsonify(_job_public(job))
+
+JOB_EVENTS_POLL_S = 0.5
+
+@app.route('/api/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-sent events: one 'data:' line per job update until it finishes."""
+    if _job_get(job_id) is None:
+        return jsonify({"ok": False, "error": "unknown job"}), 404
+
+    def stream():
+        seen = -1
+        quiet = 0.0
+        while True:
+            job = _job_get(job_id)
+            if job is None:
+                return
+            if job["version"] != seen:
+                seen = job["version"]
+                quiet = 0.0
+                yield f"data: {json.dumps(_job_public(job))}\n\n"
+                if job["state"] in ("done", "error"):
+                    return
+            elif quiet >= 15.0:
+                quiet = 0.0
+                yield ": keep-alive\n\n"
+            time.sleep(JOB_EVENTS_POLL_S)
+            quiet += JOB_EVENTS_POLL_S
+
+    resp = Response(stream_with_context(stream()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
 # ─── Routes ───────────────────────────────────────
 
 @app.route('/')
@@ -1069,6 +2985,126 @@ def genius_lyrics():
     lyrics = "\n".join(div.get_text(separator='\n').strip() for div in lyrics_divs)
     return jsonify({'lyrics': lyrics})
 
+def _audio_duration(path):
+    try:
+        return float(sf.info(path).duration)
+    except Exception:
+        return float(librosa.get_duration(path=path))
+
+def _cut_clip(path, out_path, offset, duration):
+    """Write [offset, offset+duration) of path as a stereo-preserving WAV."""
+    try:
+        with sf.SoundFile(path) as fh:
+            fh.seek(min(int(offset * fh.samplerate), fh.frames))
+            y = fh.read(int(duration * fh.samplerate), dtype='float32', always_2d=True)
+            rate = fh.samplerate
+    except Exception:
+        y, rate = librosa.load(path, sr=None, mono=False, offset=offset, duration=duration)
+        y = np.atleast_2d(y).T
+    sf.write(out_path, y, rate)
+    return out_path
+
+def _preview_offset(duration, window):
+    return float(max(0.0, min(PREVIEW_OFFSET_S, duration - window)))
+
+def _instrumental_from_stems(b_dir, mode, work_dir):
+    """Instrumental stem path: no_vocals, or (4-stem) bass+drums+other summed into work_dir."""
+    if mode != "4stem":
+        return pick_instrumental_2stem(Path(b_dir))
+    b_inst = pick_instrumental_2stem(Path(b_dir))
+    if b_inst:
+        return b_inst
+    try:
+        stems = {}
+        files = {f.stem.lower(): f for f in _stem_files(Path(b_dir))}
+        for name in ('bass','drums','other'):
+            p = files.get(name)
+            if p is not None and p.exists():
+                y, sr = librosa.load(str(p), sr=None, mono=True)
+                stems[name] = (y, sr)
+    except Exception as e:
+        raise RuntimeError(f"Failed to build 4-stem instrumental: {e}")
+    if not stems:
+        raise RuntimeError("Could not build instrumental from 4 stems")
+    try:
+        L = max(len(y) for y,_ in stems.values())
+        parts = []
+        sr = list(stems.values())[0][1]
+        for y,_ in stems.values():
+            parts.append(np.pad(y, (0, L-len(y))))
+        mix = np.sum(parts, axis=0)
+        peak = float(np.max(np.abs(mix)) + 1e-9)
+        if peak > 1.0: mix /= peak
+        b_inst = os.path.join(work_dir,'inst_mix.wav')
+        sf.write(b_inst, mix, sr)
+    except Exception as e:
+        raise RuntimeError(f"Failed to build 4-stem instrumental: {e}")
+    return b_inst
+
+def _remix_files(a_in, b_in, mode, work_dir, progress=None, preview=False):
+    """
+    Split both songs, take A's vocals and B's instrumental, render the remix
+    into OUTPUT_FOLDER. Returns (out_name, meta); raises RuntimeError with a
+    user-facing message.
+    preview: render a short MP3 of one window. Songs without cached stems are
+    cut to that window before separation, so Demucs only sees a minute of audio;
+    the clip's stems go to a scratch dir in work_dir, not the stem cache.
+    """
+    report = progress or (lambda stage, frac: None)
+    window = 2.0 * PREVIEW_S
+    off_a = off_b = 0.0
+    scratch = (None, None)
+    if preview:
+        srcs = []
+        for tag, path in (('a', a_in), ('b', b_in)):
+            with open(path, 'rb') as fh:
+                cached = _stem_cache_lookup(_file_digest(fh), mode)
+            off = _preview_offset(_audio_duration(path), window)
+            sc = None
+            if cached is None:
+                path = _cut_clip(path, os.path.join(work_dir, f"{tag}_preview.wav"), off, window)
+                off = 0.0
+                sc = os.path.join(work_dir, f"{tag}_stems")
+            srcs.append((path, off, sc))
+        (a_in, off_a, sc_a), (b_in, off_b, sc_b) = srcs
+        scratch = (sc_a, sc_b)
+
+    # Split both songs concurrently (skipped for tracks already in the stem cache)
+    try:
+        report('split', 0.0)
+        (a_dir, _), (b_dir, _) = separate_pair(a_in, b_in, mode=mode, scratch=scratch,
+                                               progress=lambda done: report('split', 0.3 * done))
+    except Exception as e:
+        raise RuntimeError(f"Demucs failed. Make sure `pip install demucs` and ffmpeg are installed. Details: {e}")
+
+    # Pin both entries so a concurrent store can't evict them before the render has read them
+    with stem_pins(a_dir, b_dir):
+        # Pick stems (STRICT A=vocals; B=instrumental)
+        a_voc = pick_vocals_stem(Path(a_dir))
+        b_inst = _instrumental_from_stems(Path(b_dir), mode, work_dir)
+
+        if not a_voc or not b_inst:
+            raise RuntimeError("could not find correct stems")
+
+        print("A vocals:", a_voc)
+        print("B instrumental:", b_inst)
+
+        # Remix
+        sub = lambda st, fr: report(st, 0.6 + 0.4 * fr)
+        if preview:
+            out_name = f"remix_preview_{uuid.uuid4().hex[:8]}.mp3"
+            out_path = os.path.join(OUTPUT_FOLDER, out_name)
+            meta = dsp_call(make_remix_preview, a_voc, b_inst, out_path, offset_v=off_a, offset_i=off_b,
+                            progress=sub)
+            return out_name, meta
+        out_name = f"remix_{uuid.uuid4().hex[:8]}.wav"
+        out_path = os.path.join(OUTPUT_FOLDER, out_name)
+        meta = dsp_call(make_remix, a_voc, b_inst, out_path, progress=sub)
+        return out_name, meta
+
+def _wants_async():
+    return str(request.values.get("async", "")).lower() in ("1", "true", "yes")
+
 @app.post("/api/remix")
 def api_remix():
     """
@@ -1076,65 +3112,42 @@ def api_remix():
       songA: file (use vocals from this)
       songB: file (use instrumental from this)
       mode: 2stem|4stem (default 2stem)
+      async: 1 → return 202 + job id right away (see /api/jobs/<id>)
+      preview: 1 → ~30 s low-bitrate MP3 of one window instead of the full render
     """
     if "songA" not in request.files or "songB" not in request.files:
         return jsonify({"ok": False, "error": "songA and songB required"}), 400
 
     mode = request.form.get("mode", "2stem")
-    with TemporaryDirectory() as td:
-        a_in = os.path.join(td, secure_filename(request.files["songA"].filename or "a.wav"))
-        b_in = os.path.join(td, secure_filename(request.files["songB"].filename or "b.wav"))
+    preview = str(request.form.get("preview", "")).lower() in ("1", "true", "yes")
+    base = request.host_url.rstrip("/")
+
+    if _wants_async():
+        job_dir = tempfile.mkdtemp(prefix="slitoex_job_")
+        a_in = os.path.join(job_dir, "a_" + secure_filename(request.files["songA"].filename or "a.wav"))
+        b_in = os.path.join(job_dir, "b_" + secure_filename(request.files["songB"].filename or "b.wav"))
         request.files["songA"].save(a_in)
         request.files["songB"].save(b_in)
 
-        # Split with Demucs
-        try:
-            a_dir = run_demucs(a_in, mode=mode)
-            b_dir = run_demucs(b_in, mode=mode)
-        except Exception as e:
-            return jsonify({"ok": False, "error": f"Demucs failed. Make sure `pip install demucs` and ffmpeg are installed. Details: {e}"}), 500
-
-        # Pick stems (STRICT A=vocals; B=instrumental)
-        a_voc = pick_vocals_stem(Path(a_dir))
-        if mode == "4stem":
-            b_inst = pick_instrumental_2stem(Path(b_dir))
-            if not b_inst:
-                try:
-                    stems = {}
-                    for name in ('bass','drums','other'):
-                        p = Path(b_dir) / f'{name}.wav'
-                        if p.exists():
-                            y, sr = librosa.load(str(p), sr=None, mono=True)
-                            stems[name] = (y, sr)
-                    if not stems:
-                        return jsonify({"ok": False, "error": "Could not build instrumental from 4 stems"}), 500
-                    L = max(len(y) for y,_ in stems.values())
-                    parts = []
-                    sr = list(stems.values())[0][1]
-                    for y,_ in stems.values():
-                        parts.append(np.pad(y, (0, L-len(y))))
-                    mix = np.sum(parts, axis=0)
-                    peak = float(np.max(np.abs(mix)) + 1e-9)
-                    if peak > 1.0: mix /= peak
-                    b_inst = os.path.join(td,'inst_mix.wav')
-                    sf.write(b_inst, mix, sr)
-                except Exception as e:
-                    return jsonify({"ok": False, "error": f"Failed to build 4-stem instrumental: {e}"}), 500
-        else:
-            b_inst = pick_instrumental_2stem(Path(b_dir))
-
-        if not a_voc or not b_inst:
-            return jsonify({"ok": False, "error": "could not find correct stems"}), 500
-
-        print("A vocals:", a_voc)
-        print("B instrumental:", b_inst)
+        def run(progress):
+            try:
+                out_name, meta = _remix_files(a_in, b_in, mode, job_dir, progress=progress, preview=preview)
+            finally:
+                shutil.rmtree(job_dir, ignore_errors=True)
+            return {"ok": True, "preview": f"{base}/share/{out_name}", "meta": meta}
+        return _submit_job_response("remix", run, cleanup_dir=job_dir)
 
-        # Remix
-        out_name = f"remix_{uuid.uuid4().hex[:8]}.wav"
-        out_path = os.path.join(OUTPUT_FOLDER, out_name)
-        meta = make_remix(a_voc, b_inst, out_path)
+    with TemporaryDirectory() as td:
+        # a_/b_ prefixes keep same-named uploads from sharing a Demucs output dir
+        a_in = os.path.join(td, "a_" + secure_filename(request.files["songA"].filename or "a.wav"))
+        b_in = os.path.join(td, "b_" + secure_filename(request.files["songB"].filename or "b.wav"))
+        request.files["songA"].save(a_in)
+        request.files["songB"].save(b_in)
+        try:
+            out_name, meta = _remix_files(a_in, b_in, mode, td, preview=preview)
+        except RuntimeError as e:
+            return jsonify({"ok": False, "error": str(e)}), 500
 
-    base = request.host_url.rstrip("/")
     return jsonify({
         "ok": True,
         "preview": f"{base}/share/{out_name}",
@@ -1481,33 +3494,93 @@ def qr_code():
 
 # ─── Stem splitter endpoints ----------------------------------------------
 
+def _split_stems(f, mode, base, progress=None, chunk_s=None):
+    """Cache lookup → save upload → Demucs. Returns the /api/split payload."""
+    report = progress or (lambda stage, frac: None)
+    digest = _file_digest(f.stream)
+    out_dir = _stem_cache_lookup(digest, mode)
+    cached = out_dir is not None
+    if not cached:
+        # Content-addressed name: same-named uploads never overwrite each other
+        safe = secure_filename(f.filename or 'track.wav')
+        in_path = os.path.join(AUDIO_INPUT, f"{digest[:16]}_{safe}")
+        if not os.path.exists(in_path):
+            tmp = f"{in_path}.{uuid.uuid4().hex[:8]}.part"
+            f.save(tmp)
+            os.replace(tmp, in_path)
+        report('split', 0.05)
+        out_dir, cached = separate_cached(in_path, mode, digest=digest, chunk_s=chunk_s)
+    report('encode', 0.9)
+    encs = _stem_encode(Path(out_dir), STEM_ENCODINGS)
+    rel_map = collect_stems(out_dir)
+    stems = {k: f"{base}/stems/{v}" for k, v in rel_map.items()}
+    report('done', 1.0)
+    return {'ok': True, 'stems': stems, 'out_dir': str(out_dir), 'cached': cached,
+            'formats': sorted(encs)}
+
 @app.route('/api/split', methods=['POST'])
 def api_split():
     """Upload audio and split with Demucs.
-    Form: file=<audio>, mode=2stem|4stem (default 2stem)
-    Returns { ok, stems: {name:url}, out_dir }
+    Form: file=<audio>, mode=2stem|4stem (default 2stem), async=1 (optional),
+          chunked=1 or chunk_s=<seconds> (optional; bounded-memory separation for long tracks)
+    Returns { ok, stems: {name:url}, out_dir } or, with async=1, 202 + job id.
     """
     if 'file' not in request.files:
         return jsonify({'ok': False, 'error': 'No file'}), 400
     f = request.files['file']
     mode = request.form.get('mode', '2stem')
-
-    safe = secure_filename(f.filename or 'track.wav')
-    in_path = os.path.join(AUDIO_INPUT, safe)
-    f.save(in_path)
+    base = request.host_url.rstrip('/')
+    try:
+        chunk_s = float(request.form.get('chunk_s') or 0.0)
+    except ValueError:
+        return jsonify({'ok': False, 'error': 'chunk_s must be a number'}), 400
+    if not chunk_s and str(request.form.get('chunked', '')).lower() in ('1', 'true', 'yes'):
+        chunk_s = DEMUCS_CHUNK_S
+    chunk_s = max(10.0, chunk_s) if chunk_s else None
+
+    if _wants_async():
+        # The request's upload stream is gone once we return; stage it first.
+        job_dir = tempfile.mkdtemp(prefix="slitoex_job_")
+        staged = os.path.join(job_dir, secure_filename(f.filename or 'track.wav'))
+        f.save(staged)
+
+        def run(progress):
+            try:
+                with open(staged, 'rb') as fh:
+                    return _split_stems(FileStorage(fh, filename=os.path.basename(staged)), mode, base,
+                                        progress, chunk_s=chunk_s)
+            finally:
+                shutil.rmtree(job_dir, ignore_errors=True)
+        return _submit_job_response("split", run, cleanup_dir=job_dir)
 
     try:
-        out_dir = run_demucs(in_path, mode)
-        rel_map = collect_stems(out_dir)
-        base = request.host_url.rstrip('/')
-        stems = {k: f"{base}/stems/{v}" for k, v in rel_map.items()}
-        return jsonify({'ok': True, 'stems': stems, 'out_dir': str(out_dir)})
+        return jsonify(_split_stems(f, mode, base, chunk_s=chunk_s))
     except Exception as e:
         return jsonify({'ok': False, 'error': str(e)}), 500
 
 @app.route('/stems/<path:subpath>')
 def serve_stem(subpath):
+    """Serve a stem; ?format=flac|opus|mp3|wav picks an encoding (Range requests supported)."""
     full = Path(STEMS_OUTPUT) / subpath
+    fmt = (request.args.get('format') or '').lower()
+    if fmt and fmt not in STEM_FORMATS:
+        return jsonify({'ok': False, 'error': f"format must be one of {', '.join(STEM_FORMATS)}"}), 400
+    entry = full.parent
+    man = _read_manifest(entry) if entry.resolve().parent == Path(STEM_CACHE_DIR).resolve() else None
+    if man:
+        name = full.stem
+        if name not in man['stems']:
+            return ('Not Found', 404)
+        if fmt:
+            encs = man.get('encodings', {})
+            if fmt not in encs:
+                encs = _stem_encode(entry, [fmt])
+            fn = encs.get(fmt, {}).get(name)
+            if fn is None:
+                return jsonify({'ok': False, 'error': f'{fmt} encoding unavailable'}), 415
+        else:
+            fn = full.name if full.exists() else man['stems'][name]
+        return send_from_directory(entry, fn, mimetype=STEM_FORMATS.get(Path(fn).suffix.lstrip('.'), (None,)*5)[3])
     if not full.exists():
         return ('Not Found', 404)
     return send_from_directory(full.parent, full.name)
@@ -1629,11 +3702,14 @@ SPLITTER_HTML = """<!doctype html>
         names.sort((a,b)=>a.localeCompare(b));
         for(const name of names){
           const url = stems[name];
+          // Lightweight encoding for the player; the download stays lossless.
+          const fmts = json.formats || [];
+          const play = fmts.includes('opus') ? url + '?format=opus' : (fmts.includes('mp3') ? url + '?format=mp3' : url);
           const card = document.createElement('div');
           card.className = 'stem';
           card.innerHTML = `
             <div><b>${name}</b></div>
-            <audio controls src="${url}"></audio>
+            <audio controls preload="none" src="${play}"></audio>
             <div style="margin-top:6px;">
               <a class="btn btn-secondary" href="${url}" download>Download</a>
             </div>`;
@@ -1659,9 +3735,106 @@ def splitter():
 
 # ─── Main ─────────────────────────────────────────
 
+# ─── Startup warmup + readiness (/healthz) ───────────────────────────────
+import importlib.util
+import multiprocessing
+
+WARMUP_ENABLED   = os.environ.get('SLITOEX_WARMUP', '1') == '1'
+WARMUP_TIMEOUT_S = float(os.environ.get('SLITOEX_WARMUP_TIMEOUT', '600'))
+BOOT_TIME = time.time()
+
+_warmup = {"ready": not WARMUP_ENABLED, "started": None, "finished": None, "stages": {}}
+_warmup_lock = threading.Lock()
+
+def _demucs_worker_ready():
+    return {"pid": os.getpid(), "model": _demucs_model is not None}
+
+def _warm_stage(name, fn):
+    _warmup["stages"][name] = {"status": "running"}
+    t0 = time.perf_counter()
+    try:
+        st = fn()
+    except Exception as e:
+        print(f"[WARMUP] {name} failed:", e)
+        st = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    st["seconds"] = round(time.perf_counter() - t0, 2)
+    _warmup["stages"][name] = st
+    print(f"[WARMUP] {name}: {st['status']} ({st['seconds']}s)")
+
+def _warm_dsp():
+    if DSP_WORKERS <= 0:
+        return {"status": "ok", "inline": True, **_dsp_warm()}
+    _dsp_pool()
+    warm = None if DSP_WARM_WORKERS else dsp_call(_dsp_warm, timeout=WARMUP_TIMEOUT_S)
+    workers = [f.result(timeout=WARMUP_TIMEOUT_S) for f in list(_dsp_warm_futs)]
+    failed = [w for w in workers if "error" in w]
+    return {"status": "failed" if failed else "ok", "warm": warm, "workers": workers}
+
+def _warm_demucs():
+    if importlib.util.find_spec("demucs") is None:
+        return {"status": "skipped", "reason": "demucs not installed"}
+    pool = _demucs_pool()
+    futs = [pool.submit(_demucs_worker_ready) for _ in range(max(1, DEMUCS_WORKERS))]
+    workers = [f.result(timeout=WARMUP_TIMEOUT_S) for f in futs]
+    loaded = all(w["model"] for w in workers)
+    return {"status": "ok" if loaded else "cli", "model": DEMUCS_MODEL, "workers": workers}
+
+def _boot_warmup():
+    """Start the DSP workers (warming one) and the Demucs pool concurrently; ready once both settle."""
+    stages = [threading.Thread(target=_warm_stage, args=(name, fn), daemon=True)
+              for name, fn in (("dsp", _warm_dsp), ("demucs", _warm_demucs))]
+    for th in stages:
+        th.start()
+    for th in stages:
+        th.join()
+    _warmup["finished"] = time.time()
+    _warmup["ready"] = True
+    print(f"[WARMUP] ready after {_warmup['finished'] - BOOT_TIME:.1f}s")
+
+def _start_warmup():
+    """
+    Kick off _boot_warmup once, in the serving process only (never in pool workers).
+    Called by gunicorn's post_worker_init hook (gunicorn.conf.py), by __main__, and
+    otherwise by the first /healthz probe; importing the module starts nothing.
+    """
+    proc = multiprocessing.current_process()
+    # spawn/forkserver children (and the forkserver itself) import this module while
+    # "inheriting", before parent_process() is set; their name is already not MainProcess.
+    if (not WARMUP_ENABLED or proc.name != 'MainProcess' or getattr(proc, '_inheriting', False)
+            or multiprocessing.parent_process() is not None):
+        return
+    with _warmup_lock:
+        if _warmup["started"] is not None:
+            return
+        _warmup["started"] = time.time()
+    threading.Thread(target=_boot_warmup, name="slitoex-warmup", daemon=True).start()
+
+@app.get("/healthz")
+def healthz():
+    """Liveness + readiness: 200 once the warmup stage has finished, 503 while it runs."""
+    _start_warmup()  # servers without a start hook (flask run, ...) warm on the first probe
+    ready = bool(_warmup["ready"])
+    return jsonify({
+        "ok": True,
+        "ready": ready,
+        "uptime_s": round(time.time() - BOOT_TIME, 1),
+        "warmup": {
+            "enabled": WARMUP_ENABLED,
+            "seconds": (round(_warmup["finished"] - _warmup["started"], 2)
+                        if _warmup["finished"] and _warmup["started"] else None),
+            "stages": _warmup["stages"],
+        },
+        "dsp_workers": DSP_WORKERS,
+        "numba_cache": os.environ.get("NUMBA_CACHE_DIR"),
+        "madmom": bool(HAVE_MADMOM),
+        "rubberband": {"lib": bool(HAVE_LIBRB), "cli": bool(HAVE_RB)},
+    }), 200 if ready else 503
+
 if __name__ == '__main__':
     import threading
     import webbrowser
+    multiprocessing.freeze_support()  # frozen builds: DSP pools start workers without fork
+    _start_warmup()
 
     PORT = int(os.environ.get('PORT', '5000'))
     app.config['PORT'] = PORT
@@ -0,0 +1,239 @@
+"""
+DSP benchmark + accuracy suite for the audio helpers in app.py.
+
+Builds synthetic signals with known BPM / key / onset positions, times the
+analysis and render helpers across track lengths and writes a JSON report.
+
+  python bench_dsp.py                          # 30 s and 120 s tracks
+  python bench_dsp.py --lengths 30,240 --out bench_dsp.json
+  python bench_dsp.py --baseline old.json      # exit 1 if anything got >25% slower
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import soundfile as sf
+import librosa
+
+os.environ.setdefault("SLITOEX_WARMUP", "0")   # the suite warms what it measures itself
+import app as A
+
+SR = 44100
+NAMES = A.NAMES
+
+# ─── Synthetic signals ────────────────────────────
+
+def click_track(bpm, dur, sr=SR, start=0.0, seed=0):
+    """Noise-burst 'kick' on every beat from `start`."""
+    rng = np.random.default_rng(seed)
+    y = np.zeros(int(dur * sr), np.float32)
+    env = np.exp(-np.arange(4000) / 600.0).astype(np.float32)
+    t = start
+    while t < dur:
+        n = int(t * sr)
+        L = min(len(y) - n, len(env))
+        y[n:n+L] += rng.standard_normal(L).astype(np.float32) * env[:L]
+        t += 60.0 / bpm
+    return y
+
+def chord_pad(tonic, major, dur, sr=SR, bpm=120.0):
+    """I–IV–V–I triads in the given key, one chord per bar."""
+    t = np.arange(int(dur * sr)) / sr
+    third = 4 if major else 3
+    bar = 4 * 60.0 / bpm
+    y = np.zeros_like(t, dtype=np.float32)
+    for k, root in enumerate((0, 5, 7, 0) * int(np.ceil(dur / (4 * bar)) + 1)):
+        a, b = int(k * bar * sr), int((k + 1) * bar * sr)
+        if a >= len(t):
+            break
+        tt = t[a:b]
+        for iv in (0, third, 7):
+            f = 261.63 * 2 ** (((tonic + root + iv) % 12) / 12.0)
+            y[a:b] += (np.sin(2*np.pi*f*tt) + 0.3*np.sin(2*np.pi*2*f*tt)).astype(np.float32)
+    return 0.15 * y
+
+def mixed(bpm, tonic, major, dur, start=0.0, seed=0):
+    return click_track(bpm, dur, start=start, seed=seed) * 0.6 + chord_pad(tonic, major, dur, bpm=bpm)
+
+def key_name(tonic, major):
+    return f"{NAMES[tonic]} {'major' if major else 'minor'}"
+
+def tempo_err(est, true):
+    """Absolute BPM error, allowing half/double tempo as a separate flag."""
+    err = abs(est - true)
+    octave = min(abs(est - 2*true), abs(est - true/2))
+    return float(err), bool(err <= 2.0), bool(min(err, octave) <= 2.0)
+
+def first_onset(y, sr=SR, thresh=0.05):
+    idx = np.flatnonzero(np.abs(y) > thresh * (np.max(np.abs(y)) + 1e-12))
+    return float(idx[0]) / sr if idx.size else 0.0
+
+# ─── Runner ───────────────────────────────────────
+
+REPEAT = 3
+
+def measure(fn, *args, **kw):
+    """
+    (result, best wall time of REPEAT plain runs, peak MB). tracemalloc slows
+    allocation-heavy code a lot, so the peak comes from one extra traced run.
+    """
+    walls = []
+    for _ in range(max(1, REPEAT)):
+        t0 = time.perf_counter()
+        out = fn(*args, **kw)
+        walls.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(*args, **kw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, min(walls), peak / 2**20
+
+def row(name, length, wall, peak, **acc):
+    r = {"name": name, "length_s": length, "wall_s": round(wall, 4),
+         "throughput_x": round(length / wall, 2) if wall > 0 else None,
+         "peak_mb": round(peak, 1)}
+    r.update(acc)
+    return r
+
+def bench_length(dur, td):
+    rows = []
+    cases = [(92.0, 2, True), (120.0, 9, False), (140.0, 7, True)]
+
+    for bpm, tonic, major in cases:
+        y = mixed(bpm, tonic, major, dur)
+        est, wall, peak = measure(A._tempo, y, SR)
+        err, ok, ok_oct = tempo_err(est, bpm)
+        rows.append(row("_tempo", dur, wall, peak, true_bpm=bpm, est_bpm=round(est, 2),
+                        bpm_err=round(err, 2), ok=ok, ok_octave=ok_oct))
+
+        snip = y[:int(min(dur, 30.0) * SR)]
+        det, wall, peak = measure(A._tempo_detail, snip, SR)
+        err, ok, ok_oct = tempo_err(det["bpm"], bpm)
+        rows.append(row("_tempo_detail", min(dur, 30.0), wall, peak, true_bpm=bpm, est_bpm=det["bpm"],
+                        bpm_err=round(err, 2), ok=ok, ok_octave=ok_oct))
+
+        (name, _, _), wall, peak = measure(A._key, y, SR)
+        rows.append(row("_key", dur, wall, peak, true_key=key_name(tonic, major), est_key=name,
+                        ok=name == key_name(tonic, major)))
+
+    # Alignment: vocal onsets on a 120 BPM grid starting at 0.7 s; error = distance
+    # of the aligned first onset to the instrumental beat grid.
+    bpm = 120.0
+    inst = mixed(bpm, 0, True, dur)
+    voc = click_track(bpm, dur, start=0.7, seed=3) * 0.8
+    out, wall, peak = measure(A._align_smart, voc, inst, SR)
+    t0 = first_onset(out)
+    period = 60.0 / bpm
+    err_ms = 1000.0 * min(t0 % period, period - (t0 % period))
+    rows.append(row("_align_smart", dur, wall, peak, first_onset_s=round(t0, 3),
+                    grid_err_ms=round(err_ms, 1), ok=bool(err_ms <= 30.0)))
+
+    # Stretch / shift: length and pitch against the request.
+    tone = (0.5 * np.sin(2*np.pi*440.0*np.arange(int(dur*SR))/SR)).astype(np.float32)
+    rate = 1.2
+    out, wall, peak = measure(A._tstretch, tone, SR, rate)
+    len_err = abs(len(out) - len(tone) / rate) / (len(tone) / rate)
+    rows.append(row("_tstretch", dur, wall, peak, rate=rate, length_err=round(float(len_err), 4),
+                    ok=bool(len_err < 0.01)))
+    semi = 3.0
+    out, wall, peak = measure(A._pshift, tone, SR, semi)
+    seg = out[len(out)//4: len(out)//4 + SR]
+    spec = np.abs(np.fft.rfft(seg * np.hanning(len(seg))))
+    f_est = float(np.fft.rfftfreq(len(seg), 1.0/SR)[np.argmax(spec)])
+    f_true = 440.0 * 2 ** (semi / 12.0)
+    cents = 1200.0 * np.log2(f_est / f_true)
+    rows.append(row("_pshift", dur, wall, peak, semitones=semi, cents_err=round(float(cents), 1),
+                    ok=bool(abs(cents) < 20.0)))
+    out, wall, peak = measure(A._stretch_shift, tone, SR, rate, semi)
+    len_err = abs(len(out) - len(tone) / rate) / (len(tone) / rate)
+    seg = out[len(out)//4: len(out)//4 + SR]
+    spec = np.abs(np.fft.rfft(seg * np.hanning(len(seg))))
+    cents = 1200.0 * np.log2(float(np.fft.rfftfreq(len(seg), 1.0/SR)[np.argmax(spec)]) / f_true)
+    rows.append(row("_stretch_shift", dur, wall, peak, rate=rate, semitones=semi,
+                    length_err=round(float(len_err), 4), cents_err=round(float(cents), 1),
+                    ok=bool(len_err < 0.01 and abs(cents) < 20.0)))
+
+    # Full remix: vocal 100 BPM D major, instrumental 120 BPM C major.
+    v_path = os.path.join(td, f"voc_{dur}.wav")
+    i_path = os.path.join(td, f"inst_{dur}.wav")
+    o_path = os.path.join(td, f"out_{dur}.wav")
+    sf.write(v_path, chord_pad(2, True, dur, bpm=100.0) + click_track(100.0, dur, start=0.5) * 0.4, SR)
+    sf.write(i_path, mixed(120.0, 0, True, dur), SR)
+    meta, wall, peak = measure(A.make_remix, v_path, i_path, o_path)
+    ok = (tempo_err(meta["vocal_bpm"], 100.0)[2] and tempo_err(meta["inst_bpm"], 120.0)[2]
+          and meta["vocal_key"] == "D major" and meta["inst_key"] == "C major")
+    rows.append(row("make_remix", dur, wall, peak, vocal_bpm=round(meta["vocal_bpm"], 2),
+                    inst_bpm=round(meta["inst_bpm"], 2), vocal_key=meta["vocal_key"],
+                    inst_key=meta["inst_key"], semitones=meta["semitones"], ok=ok))
+    return rows
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    def agg(rows):
+        out = {}
+        for r in rows:
+            k = (r["name"], r["length_s"])
+            out[k] = out.get(k, 0.0) + r["wall_s"]
+        return out
+    old, new = agg(base["results"]), agg(results)
+    slower = []
+    for k, t in new.items():
+        if k in old and old[k] > 0 and t > old[k] * tolerance:
+            slower.append((k, old[k], t))
+    for (name, length), t_old, t_new in slower:
+        print(f"REGRESSION {name} @ {length:g}s: {t_old:.3f}s → {t_new:.3f}s")
+    return not slower
+
+def main(argv=None):
+    global REPEAT
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--lengths", default="30,120", help="comma-separated track lengths in seconds")
+    ap.add_argument("--out", default="bench_dsp.json")
+    ap.add_argument("--baseline", default=None, help="previous report to compare wall times against")
+    ap.add_argument("--tolerance", type=float, default=1.25)
+    ap.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per case (best is reported)")
+    args = ap.parse_args(argv)
+    REPEAT = args.repeat
+
+    lengths = [float(x) for x in args.lengths.split(",") if x.strip()]
+    # Warm numba/JIT so the first case doesn't carry compile time.
+    warm = mixed(120.0, 0, True, 5.0)
+    A._tempo(warm, SR); A._tempo_detail(warm, SR); A._key(warm, SR)
+
+    results = []
+    with TemporaryDirectory() as td:
+        for dur in lengths:
+            rows = bench_length(dur, td)
+            for r in rows:
+                print(f"{r['name']:<15} {r['length_s']:>6g}s  {r['wall_s']:>8.3f}s  "
+                      f"{r['throughput_x'] or 0:>7.1f}x  {r['peak_mb']:>7.1f} MB  ok={r.get('ok')}")
+            results.extend(rows)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0], "platform": platform.platform(),
+            "numpy": np.__version__, "librosa": librosa.__version__,
+            "rubberband": bool(A.HAVE_RB), "rubberband_lib": bool(A.HAVE_LIBRB),
+            "madmom": bool(A.HAVE_MADMOM),
+            "cpu_count": os.cpu_count(), "repeat": REPEAT,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n→ wrote {args.out}")
+
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
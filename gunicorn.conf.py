@@ -0,0 +1,7 @@
+# gunicorn settings; the Procfile passes this with -c, its other flags still apply.
+
+def post_worker_init(worker):
+    # Start the boot warmup once the worker has loaded the app (importing app.py
+    # doesn't), so the DSP and Demucs pools are built from the serving process.
+    from app import _start_warmup
+    _start_warmup()
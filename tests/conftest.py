@@ -0,0 +1,41 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+# Configure before app is imported: no boot warmup, DSP work inline, state in a scratch dir.
+_STATE = tempfile.mkdtemp(prefix="slitoex-tests-")
+os.environ.setdefault("SLITOEX_WARMUP", "0")
+os.environ.setdefault("SLITOEX_DSP_WORKERS", "0")
+os.environ.setdefault("SLITOEX_ANALYZE_CACHE", os.path.join(_STATE, "analyze_cache.sqlite3"))
+os.environ.setdefault("SLITOEX_JOBS_DB", os.path.join(_STATE, "jobs.sqlite3"))
+os.environ.setdefault("NUMBA_CACHE_DIR", os.path.join(_STATE, "numba_cache"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as slitoex  # noqa: E402
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    """The app module with its SQLite stores and stem cache moved into tmp_path."""
+    stems = tmp_path / "stems"
+    (stems / "cache").mkdir(parents=True)
+    monkeypatch.setattr(slitoex, "ANALYZE_CACHE_DB", str(tmp_path / "analyze_cache.sqlite3"))
+    monkeypatch.setattr(slitoex, "JOBS_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(slitoex, "STEMS_OUTPUT", str(stems))
+    monkeypatch.setattr(slitoex, "STEM_CACHE_DIR", str(stems / "cache"))
+    return slitoex
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def write_wav(path, seconds=2.0, f0=440.0, sr=44100):
+    t = np.arange(int(seconds * sr)) / sr
+    sf.write(str(path), (0.2 * np.sin(2 * np.pi * f0 * t)).astype(np.float32), sr)
+    return str(path)
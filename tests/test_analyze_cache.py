@@ -0,0 +1,67 @@
+import io
+import json
+
+import pytest
+
+from conftest import write_wav
+
+
+@pytest.fixture
+def analyses(app_module, monkeypatch):
+    """_analyze_samples replaced by a stub; returns the list of calls."""
+    calls = []
+
+    def fake_analyze(y, sr, offset=0.2, hop=256, band=(70.0, 180.0), default_bpm=120.0):
+        calls.append(len(y))
+        return {"bpm": 123.0, "confidence": 0.9, "alt_bpms": [], "key": "A minor", "beats": [],
+                "loudness_db": -12.0, "peak_db": -1.0}
+
+    monkeypatch.setattr(app_module, "_analyze_samples", fake_analyze)
+    return calls
+
+
+def _analyze(client, data, name):
+    return client.post("/api/analyze", data={"file": (io.BytesIO(data), name)},
+                       content_type="multipart/form-data").get_json()
+
+
+def _analyze_batch(client, data, name):
+    resp = client.post("/api/analyze_batch", data={"files": [(io.BytesIO(data), name)]},
+                       content_type="multipart/form-data")
+    return [json.loads(ln) for ln in resp.get_data(as_text=True).splitlines() if ln.strip()]
+
+
+def test_single_route_answers_repeat_from_cache(client, analyses, tmp_path):
+    data = open(write_wav(tmp_path / "a.wav"), "rb").read()
+    first = _analyze(client, data, "a.wav")
+    second = _analyze(client, data, "a.wav")
+    assert first["bpm"] == 123.0 and "cached" not in first
+    assert second["cached"] is True and second["key"] == "A minor"
+    assert len(analyses) == 1
+
+
+def test_batch_entry_serves_single_route(client, analyses, tmp_path):
+    data = open(write_wav(tmp_path / "a.wav", f0=330.0), "rb").read()
+    lines = _analyze_batch(client, data, "a.wav")
+    assert lines[0]["bpm"] == 123.0 and "cached" not in lines[0]
+    assert lines[-1] == {"done": True, "count": 1}
+
+    single = _analyze(client, data, "renamed.wav")
+    assert single["cached"] is True
+    assert len(analyses) == 1
+
+
+def test_single_route_entry_serves_batch(client, analyses, tmp_path):
+    data = open(write_wav(tmp_path / "a.wav", f0=550.0), "rb").read()
+    _analyze(client, data, "a.wav")
+    lines = _analyze_batch(client, data, "a.wav")
+    assert lines[0]["cached"] is True
+    assert len(analyses) == 1
+
+
+def test_key_covers_only_the_prefix(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "ANALYZE_KEY_BYTES", 4)
+    a = app_module._analysis_digest(io.BytesIO(b"RIFFxxxx"))
+    b = app_module._analysis_digest(io.BytesIO(b"RIFFyyyy"))
+    c = app_module._analysis_digest(io.BytesIO(b"RIFX"))
+    assert a == b != c
@@ -0,0 +1,109 @@
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from conftest import write_wav
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+class Upload:
+    """An upload as _request_upload yields it, counting how many bytes were pulled."""
+
+    def __init__(self, path, chunk=64 * 1024):
+        self.data = open(path, "rb").read()
+        self.chunk = chunk
+        self.read = 0
+
+    def __iter__(self):
+        for i in range(0, len(self.data), self.chunk):
+            self.read = min(i + self.chunk, len(self.data))
+            yield self.data[i:i + self.chunk]
+
+
+def _window(path, offset, duration, sr=44100):
+    y, rate = sf.read(path, dtype="float32")
+    assert rate == sr
+    start = int(round(offset * sr))
+    return y[start:start + int(round(duration * sr))]
+
+
+@pytest.fixture
+def no_ffmpeg(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.shutil, "which", lambda name: None)
+
+
+@requires_ffmpeg
+def test_pipe_decoder_stops_at_window(app_module, tmp_path):
+    path = write_wav(tmp_path / "long.wav", seconds=20.0)
+    upload = Upload(path)
+    dec = app_module._PipeDecoder(44100, 0.2, 2.0)
+    try:
+        for b in upload:
+            if not dec.feed(b):
+                break
+        y = dec.window()
+    finally:
+        dec.close()
+    assert upload.read < len(upload.data)
+    np.testing.assert_allclose(y, _window(path, 0.2, 2.0), atol=1e-4)
+
+
+@requires_ffmpeg
+def test_ingest_reads_window_and_key_prefix_only(app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "ANALYZE_KEY_BYTES", 64 * 1024)
+    path = write_wav(tmp_path / "long.wav", seconds=20.0)
+    upload = Upload(path)
+    y, sr, digest, hit, complete = app_module._ingest_snippet(upload, str(tmp_path / "spool"),
+                                                              offset=0.2, duration=2.0)
+    assert (hit, complete) == (None, False)
+    assert upload.read < len(upload.data)
+    with open(path, "rb") as fh:
+        assert digest == app_module._analysis_digest(fh)
+    np.testing.assert_allclose(y, _window(path, 0.2, 2.0), atol=1e-4)
+
+
+@requires_ffmpeg
+def test_ingest_falls_back_when_ffmpeg_cannot_stream(app_module, tmp_path):
+    # MP4 with the index at the end can't be decoded from a pipe.
+    wav = write_wav(tmp_path / "a.wav", seconds=4.0)
+    m4a = str(tmp_path / "a.m4a")
+    subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", wav, "-c:a", "aac", m4a],
+                   check=True)
+    upload = Upload(m4a, chunk=4096)
+    y, sr, digest, hit, complete = app_module._ingest_snippet(upload, str(tmp_path / "spool.m4a"),
+                                                              offset=0.2, duration=2.0)
+    assert complete
+    assert len(y) == 2 * 44100
+
+
+def test_ingest_without_ffmpeg_probes_prefix(app_module, no_ffmpeg, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "ANALYZE_KEY_BYTES", 64 * 1024)
+    path = write_wav(tmp_path / "long.wav", seconds=20.0)
+    upload = Upload(path)
+    y, sr, digest, hit, complete = app_module._ingest_snippet(upload, str(tmp_path / "spool.wav"),
+                                                              offset=0.2, duration=2.0)
+    assert not complete
+    assert upload.read < len(upload.data)
+    np.testing.assert_allclose(y, _window(path, 0.2, 2.0), atol=1e-4)
+
+
+def test_ingest_short_upload_reads_to_end(app_module, tmp_path):
+    path = write_wav(tmp_path / "short.wav", seconds=1.0)
+    y, sr, digest, hit, complete = app_module._ingest_snippet(Upload(path), str(tmp_path / "spool.wav"),
+                                                              offset=0.2, duration=2.0)
+    assert complete
+    assert len(y) == pytest.approx(0.8 * 44100, abs=2)
+
+
+def test_cache_hit_ends_read_before_decode(app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "ANALYZE_KEY_BYTES", 64 * 1024)
+    path = write_wav(tmp_path / "long.wav", seconds=20.0)
+    upload = Upload(path)
+    y, sr, digest, hit, complete = app_module._ingest_snippet(upload, str(tmp_path / "spool.wav"),
+                                                              lookup=lambda d: {"bpm": 99.0})
+    assert y is None and hit == {"bpm": 99.0}
+    assert upload.read == 64 * 1024
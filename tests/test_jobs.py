@@ -0,0 +1,108 @@
+import threading
+import time
+
+import pytest
+
+
+def _wait_for(app_module, job_id, states, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = app_module._job_get(job_id)
+        if job["state"] in states:
+            return job
+        time.sleep(0.02)
+    pytest.fail(f"job {job_id} never reached {states}: {job}")
+
+
+def test_job_runs_through_its_states(app_module):
+    release = threading.Event()
+
+    def work(progress):
+        progress("separating", 0.5)
+        release.wait(10)
+        return {"out": "mix.wav"}
+
+    job_id = app_module.submit_job("remix", work)
+    job = app_module._job_get(job_id)
+    assert job["kind"] == "remix"
+    assert job["state"] in ("queued", "running")
+
+    deadline = time.monotonic() + 10
+    while app_module._job_get(job_id)["stage"] != "separating" and time.monotonic() < deadline:
+        time.sleep(0.02)
+    job = app_module._job_get(job_id)
+    assert (job["state"], job["stage"], job["progress"]) == ("running", "separating", 0.5)
+
+    release.set()
+    job = _wait_for(app_module, job_id, ("done", "error"))
+    assert job["state"] == "done"
+    assert job["progress"] == 1.0
+    assert job["result"] == {"out": "mix.wav"}
+
+
+def test_failed_job_reports_error(app_module, client):
+    def work(progress):
+        raise ValueError("no vocals found")
+
+    job_id = app_module.submit_job("split", work)
+    job = _wait_for(app_module, job_id, ("done", "error"))
+    assert job["state"] == "error"
+    assert job["error"] == "no vocals found"
+
+    body = client.get(f"/api/jobs/{job_id}").get_json()
+    assert body["state"] == "error"
+    assert client.get("/api/jobs/nope").status_code == 404
+
+
+def test_full_queue_answers_503(app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "JOB_QUEUE_MAX", 1)
+    release = threading.Event()
+    upload_dir = tmp_path / "upload"
+    upload_dir.mkdir()
+
+    with app_module.app.test_request_context("/api/remix", method="POST"):
+        resp, status = app_module._submit_job_response("remix", lambda progress: release.wait(10))
+        assert status == 202
+        job_id = resp.get_json()["job_id"]
+
+        resp, status = app_module._submit_job_response("remix", lambda progress: None,
+                                                       cleanup_dir=str(upload_dir))
+        assert status == 503
+        assert resp.get_json()["ok"] is False
+        assert not upload_dir.exists()
+
+    release.set()
+    _wait_for(app_module, job_id, ("done",))
+    assert app_module.submit_job("remix", lambda progress: None) is not None
+
+
+def _insert_job(app_module, owner, state="running", age=0.0):
+    import uuid
+
+    job_id = uuid.uuid4().hex
+    now = time.time() - age
+    con = app_module._jobs_conn()
+    try:
+        con.execute("INSERT INTO jobs(id, kind, state, stage, progress, created, updated, owner)"
+                    " VALUES (?, 'remix', ?, 'start', 0, ?, ?, ?)", (job_id, state, now, now, owner))
+    finally:
+        con.close()
+    return job_id
+
+
+def test_jobs_of_an_earlier_process_with_our_pid_are_reaped(app_module):
+    import os
+    import socket
+
+    # A restarted container: same host name, same pid, different boot.
+    job_id = _insert_job(app_module, f"{socket.gethostname()}:{os.getpid()}:0ldb00t")
+    job = app_module._job_get(job_id)
+    assert (job["state"], job["error"]) == ("error", "server process restarted")
+
+
+def test_stalled_jobs_stop_holding_queue_slots(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "JOB_QUEUE_MAX", 1)
+    # Owned by a live process we can't see into (another host), but silent for too long.
+    job_id = _insert_job(app_module, "elsewhere:1:b00t", age=app_module.JOB_STALE_S + 60)
+    assert app_module.submit_job("remix", lambda progress: None) is not None
+    assert app_module._job_get(job_id)["error"] == "job stalled"
@@ -0,0 +1,37 @@
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+from conftest import write_wav
+
+
+def test_failed_instrumental_waits_for_running_splits(app_module, client, monkeypatch, tmp_path):
+    seen = []
+
+    def fake_run_demucs(input_path, mode="2stem", out_dir=None, chunk_s=None):
+        if "instrumental" in os.path.basename(input_path):
+            raise RuntimeError("bad instrumental")
+        time.sleep(0.5)
+        seen.append(os.path.exists(input_path))   # the staged upload must outlive the split
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_wav(out_dir / "vocals.wav", seconds=0.5)
+        write_wav(out_dir / "no_vocals.wav", seconds=0.5)
+        return out_dir, {"vocals": "vocals.wav", "no_vocals": "no_vocals.wav"}
+
+    monkeypatch.setattr(app_module, "run_demucs", fake_run_demucs)
+    monkeypatch.setattr(app_module, "DEMUCS_WORKERS", 1)
+    inst = open(write_wav(tmp_path / "inst.wav", f0=110.0), "rb").read()
+    vocal = open(write_wav(tmp_path / "vocal.wav", f0=330.0), "rb").read()
+
+    resp = client.post("/api/remix_batch", content_type="multipart/form-data", data={
+        "instrumental": (io.BytesIO(inst), "instrumental.wav"),
+        "vocals": [(io.BytesIO(vocal), "vocal.wav"), (io.BytesIO(vocal[:-2]), "vocal2.wav")],
+    })
+    lines = [json.loads(ln) for ln in resp.get_data(as_text=True).splitlines() if ln.strip()]
+    assert lines[-1]["ok"] is False and "instrumental" in lines[-1]["error"]
+    # The split already running when the instrumental failed finished on intact inputs;
+    # the queued one never started.
+    assert seen == [True]
@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from conftest import write_wav
+
+
+@pytest.fixture
+def demucs_calls(app_module, monkeypatch):
+    """run_demucs replaced by one that writes two short stems; returns the list of inputs."""
+    calls = []
+
+    def fake_run_demucs(input_path, mode="2stem", out_dir=None, chunk_s=None):
+        calls.append(input_path)
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_wav(out_dir / "vocals.wav", seconds=0.5, f0=330.0)
+        write_wav(out_dir / "no_vocals.wav", seconds=0.5, f0=110.0)
+        return out_dir, {"vocals": "vocals.wav", "no_vocals": "no_vocals.wav"}
+
+    monkeypatch.setattr(app_module, "run_demucs", fake_run_demucs)
+    return calls
+
+
+def test_second_separation_is_a_cache_hit(app_module, demucs_calls, tmp_path):
+    track = write_wav(tmp_path / "track.wav", f0=220.0)
+
+    entry, hit = app_module.separate_cached(track)
+    assert not hit
+    assert Path(entry).parent == Path(app_module.STEM_CACHE_DIR)
+    assert app_module.pick_vocals_stem(entry).endswith("vocals.wav")
+    assert app_module.pick_instrumental_2stem(entry).endswith("no_vocals.wav")
+
+    again, hit = app_module.separate_cached(track)
+    assert hit
+    assert again == entry
+    assert len(demucs_calls) == 1
+    assert not list((Path(app_module.STEMS_OUTPUT) / "jobs").iterdir())
+
+
+def test_eviction_drops_lru_entry_but_not_pinned_one(app_module, demucs_calls, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "STEM_CACHE_GRACE_S", 0.0)
+    first, _ = app_module.separate_cached(write_wav(tmp_path / "a.wav", f0=220.0))
+    # Room for roughly one entry: storing the next one pushes the older one out.
+    monkeypatch.setattr(app_module, "STEM_CACHE_BYTES",
+                        app_module._read_manifest(first)["bytes"] + 1)
+
+    with app_module.stem_pins(first):
+        second, _ = app_module.separate_cached(write_wav(tmp_path / "b.wav", f0=247.0))
+        assert first.exists()
+        assert second.exists()
+
+    third, _ = app_module.separate_cached(write_wav(tmp_path / "c.wav", f0=262.0))
+    assert third.exists()
+    assert not first.exists()
+    assert not second.exists()
+
+    _, hit = app_module.separate_cached(os.path.join(tmp_path, "a.wav"))
+    assert not hit
+    assert len(demucs_calls) == 4
+
+
+def test_flac_encode_keeps_wav_masters_while_pinned(app_module, demucs_calls, tmp_path):
+    entry, _ = app_module.separate_cached(write_wav(tmp_path / "a.wav"))
+    inst = app_module.pick_instrumental_2stem(entry)
+    assert inst.endswith(".wav")
+
+    with app_module.stem_pins(entry):
+        encs = app_module._stem_encode(entry, ["flac"])
+        assert "flac" in encs
+        # New readers get the FLAC master; the WAV stays for the render already holding it.
+        assert app_module.pick_instrumental_2stem(entry).endswith("no_vocals.flac")
+        assert Path(inst).exists()
+
+    assert not Path(inst).exists()
+    man = app_module._read_manifest(entry)
+    assert "stale" not in man
+    assert all((entry / fn).exists() for fn in man["stems"].values())
+    assert not list(entry.glob("*.part"))
+
+
+def test_lookups_during_encode_keep_manifest_consistent(app_module, demucs_calls, tmp_path):
+    import threading
+
+    track = write_wav(tmp_path / "a.wav")
+    entry, _ = app_module.separate_cached(track)
+    digest = app_module._read_manifest(entry)["digest"]
+    stop = threading.Event()
+
+    def touch():
+        while not stop.is_set():
+            app_module._stem_cache_lookup(digest, "2stem")
+
+    threads = [threading.Thread(target=touch) for _ in range(4)]
+    for th in threads:
+        th.start()
+    try:
+        app_module._stem_encode(entry, ["flac"])
+    finally:
+        stop.set()
+        for th in threads:
+            th.join()
+
+    man = app_module._read_manifest(entry)
+    assert all(fn.endswith(".flac") for fn in man["stems"].values())
+    _, hit = app_module.separate_cached(track)
+    assert hit
+    assert len(demucs_calls) == 1